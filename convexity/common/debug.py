@@ -0,0 +1,80 @@
+from enum import IntEnum
+
+from sonolus.script.array import Array
+from sonolus.script.debug import debug_log
+from sonolus.script.globals import level_memory
+from sonolus.script.quad import Rect
+from sonolus.script.runtime import delta_time, screen
+
+from convexity.common.effect import EffectBudget, ScheduledSfx
+from convexity.common.layout import Layer
+from convexity.common.options import Options
+from convexity.common.skin import Skin
+
+DEBUG_WINDOW = 1
+DEBUG_BAR_HEIGHT = 0.04
+
+
+class DebugCounter(IntEnum):
+    NOTES = 0
+    DRAWS = 1
+    CONNECTOR_SEGMENTS = 2
+    HITBOXES = 3
+    INPUT_NOTES = 4
+    TRANSFORMS = 5
+
+
+DEBUG_COUNTER_COUNT = len(DebugCounter)
+
+
+@level_memory
+class DebugCounters:
+    counts: Array[int, DEBUG_COUNTER_COUNT]
+    window_peaks: Array[int, DEBUG_COUNTER_COUNT]
+    peaks: Array[int, DEBUG_COUNTER_COUNT]
+    window_time: float
+
+
+def debug_count(counter: DebugCounter, amount: int = 1):
+    # Level memory is only writable from sequential callbacks, so callers check Options.debug_counters and
+    # only count from there. Draws happen in parallel and are added up by each note instead.
+    DebugCounters.counts[counter] += amount
+
+
+def end_debug_frame():
+    # Keeps the highest count of each counter over the last window, draws the peaks of the previous window
+    # as bars and logs them when the window ends.
+    if not Options.debug_counters:
+        return
+    for i in range(DEBUG_COUNTER_COUNT):
+        DebugCounters.window_peaks[i] = max(DebugCounters.window_peaks[i], DebugCounters.counts[i])
+        DebugCounters.counts[i] = 0
+    draw_debug_bars()
+    DebugCounters.window_time += delta_time()
+    if DebugCounters.window_time < DEBUG_WINDOW:
+        return
+    DebugCounters.window_time = 0
+    for i in range(DEBUG_COUNTER_COUNT):
+        DebugCounters.peaks[i] = DebugCounters.window_peaks[i]
+        DebugCounters.window_peaks[i] = 0
+        debug_log(DebugCounters.peaks[i])
+    debug_log(ScheduledSfx.merged_count)
+    debug_log(EffectBudget.merged_sfx_count)
+    debug_log(EffectBudget.dropped_sfx_count)
+    debug_log(EffectBudget.dropped_particle_count)
+
+
+def draw_debug_bars():
+    # One bar per counter down the top left of the screen, full at the count given in scales.
+    scales = Array(64, 512, 256, 64, 16, 2048)
+    bounds = screen()
+    for i in range(DEBUG_COUNTER_COUNT):
+        fill = min(DebugCounters.peaks[i] / scales[i], 1)
+        t = bounds.t - i * DEBUG_BAR_HEIGHT * 1.5
+        bar = Rect(
+            l=bounds.l,
+            r=bounds.l + fill * bounds.w / 2,
+            b=t - DEBUG_BAR_HEIGHT,
+            t=t,
+        )
+        Skin.time_line.draw(bar, z=Layer.DEBUG, a=0.8)
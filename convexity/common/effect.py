@@ -1,6 +1,31 @@
-from sonolus.script.effect import StandardEffect, effects
+from enum import IntEnum
+
+from sonolus.script.array import Array
+from sonolus.script.effect import Effect, StandardEffect, effects
+from sonolus.script.globals import level_memory
+from sonolus.script.runtime import time
+
+from convexity.common.options import Options
 
 SFX_DISTANCE = 0.02
+SFX_HISTORY_SIZE = 8
+
+# Shared caps for all effect types.
+MAX_PARTICLES_PER_FRAME = 16
+MAX_SFX_PER_FRAME = 4
+MAX_LIVE_PARTICLES = 32
+
+# Per frame caps for each effect type, and how much of the shared caps a type keeps for itself.
+# Lower priorities can't take what higher ones keep, so a chord's hits get through after a burst of lane taps.
+EFFECT_TYPE_COUNT = 3
+MAX_NOTE_PARTICLES = 12
+MAX_HOLD_PARTICLES = 6
+MAX_LANE_PARTICLES = 6
+RESERVED_NOTE_PARTICLES = 8
+RESERVED_HOLD_PARTICLES = 2
+MAX_NOTE_SFX = 4
+MAX_LANE_SFX = 2
+RESERVED_NOTE_SFX = 2
 
 
 @effects
@@ -16,3 +41,132 @@ class Effects:
     good_alt: StandardEffect.GOOD_ALTERNATIVE
 
     hold: StandardEffect.HOLD
+
+
+@level_memory
+class ScheduledSfx:
+    effect_ids: Array[int, SFX_HISTORY_SIZE]
+    times: Array[float, SFX_HISTORY_SIZE]
+    next_slot: int
+    scheduled_count: int
+    merged_count: int
+
+
+def schedule_sfx(effect: Effect, target_time: float):
+    # Notes are preprocessed roughly in time order and chords schedule the same clip at the same time,
+    # so checking only the last few scheduled clips catches nearly all duplicates.
+    for i in range(SFX_HISTORY_SIZE):
+        if ScheduledSfx.effect_ids[i] == effect.id and abs(ScheduledSfx.times[i] - target_time) < SFX_DISTANCE:
+            ScheduledSfx.merged_count += 1
+            return
+    effect.schedule(target_time, SFX_DISTANCE)
+    ScheduledSfx.effect_ids[ScheduledSfx.next_slot] = effect.id
+    ScheduledSfx.times[ScheduledSfx.next_slot] = target_time
+    ScheduledSfx.next_slot = (ScheduledSfx.next_slot + 1) % SFX_HISTORY_SIZE
+    ScheduledSfx.scheduled_count += 1
+
+
+class EffectPriority(IntEnum):
+    LANE = 0
+    HOLD = 1
+    NOTE = 2
+
+
+@level_memory
+class EffectBudget:
+    particle_count: int
+    particle_counts: Array[int, EFFECT_TYPE_COUNT]
+    particle_starts: Array[float, MAX_LIVE_PARTICLES]
+    particle_ends: Array[float, MAX_LIVE_PARTICLES]
+    sfx_count: int
+    sfx_counts: Array[int, EFFECT_TYPE_COUNT]
+    sfx_ids: Array[int, SFX_HISTORY_SIZE]
+    sfx_times: Array[float, SFX_HISTORY_SIZE]
+    next_sfx_slot: int
+    dropped_particle_count: int
+    dropped_sfx_count: int
+    merged_sfx_count: int
+
+
+def reset_effect_budget():
+    EffectBudget.particle_count = 0
+    EffectBudget.sfx_count = 0
+    for i in range(EFFECT_TYPE_COUNT):
+        EffectBudget.particle_counts[i] = 0
+        EffectBudget.sfx_counts[i] = 0
+
+
+def reserved_above(counts: Array[int, EFFECT_TYPE_COUNT], priority: EffectPriority, note: int, hold: int) -> int:
+    # What higher priorities keep and haven't used yet this frame.
+    reserved = 0
+    if priority < EffectPriority.NOTE:
+        reserved += max(0, note - counts[EffectPriority.NOTE])
+    if priority < EffectPriority.HOLD:
+        reserved += max(0, hold - counts[EffectPriority.HOLD])
+    return reserved
+
+
+def particle_type_cap(priority: EffectPriority) -> int:
+    if priority == EffectPriority.NOTE:
+        return MAX_NOTE_PARTICLES
+    if priority == EffectPriority.HOLD:
+        return MAX_HOLD_PARTICLES
+    return MAX_LANE_PARTICLES
+
+
+def sfx_type_cap(priority: EffectPriority) -> int:
+    if priority == EffectPriority.NOTE:
+        return MAX_NOTE_SFX
+    return MAX_LANE_SFX
+
+
+def reserve_particle(priority: EffectPriority, duration: float) -> bool:
+    if not Options.effect_budget:
+        return True
+    # Looping particles pass a duration of 0 and only count against the per frame caps,
+    # since their notes hold on to them until released.
+    live_count = 0
+    free_slot = 0
+    for i in range(MAX_LIVE_PARTICLES):
+        # Watch mode can skip backwards, so particles that start in the future aren't live either.
+        if EffectBudget.particle_starts[i] <= time() and time() < EffectBudget.particle_ends[i]:
+            live_count += 1
+        else:
+            free_slot = i
+    reserved = reserved_above(EffectBudget.particle_counts, priority, RESERVED_NOTE_PARTICLES, RESERVED_HOLD_PARTICLES)
+    if (
+        EffectBudget.particle_counts[priority] >= particle_type_cap(priority)
+        or EffectBudget.particle_count + reserved >= MAX_PARTICLES_PER_FRAME
+        or live_count + reserved >= MAX_LIVE_PARTICLES
+    ):
+        EffectBudget.dropped_particle_count += 1
+        return False
+    EffectBudget.particle_count += 1
+    EffectBudget.particle_counts[priority] += 1
+    if duration > 0:
+        EffectBudget.particle_starts[free_slot] = time()
+        EffectBudget.particle_ends[free_slot] = time() + duration
+    return True
+
+
+def play_sfx(effect: Effect, priority: EffectPriority):
+    if not Options.effect_budget:
+        effect.play(SFX_DISTANCE)
+        return
+    for i in range(SFX_HISTORY_SIZE):
+        if EffectBudget.sfx_ids[i] == effect.id and abs(EffectBudget.sfx_times[i] - time()) < SFX_DISTANCE:
+            EffectBudget.merged_sfx_count += 1
+            return
+    if (
+        EffectBudget.sfx_counts[priority] >= sfx_type_cap(priority)
+        or EffectBudget.sfx_count + reserved_above(EffectBudget.sfx_counts, priority, RESERVED_NOTE_SFX, 0)
+        >= MAX_SFX_PER_FRAME
+    ):
+        EffectBudget.dropped_sfx_count += 1
+        return
+    effect.play(SFX_DISTANCE)
+    EffectBudget.sfx_count += 1
+    EffectBudget.sfx_counts[priority] += 1
+    EffectBudget.sfx_ids[EffectBudget.next_sfx_slot] = effect.id
+    EffectBudget.sfx_times[EffectBudget.next_sfx_slot] = time()
+    EffectBudget.next_sfx_slot = (EffectBudget.next_sfx_slot + 1) % SFX_HISTORY_SIZE
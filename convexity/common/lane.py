@@ -1,7 +1,8 @@
-from convexity.common.effect import SFX_DISTANCE, Effects
+from convexity.common.effect import EffectPriority, Effects, play_sfx, reserve_particle
 from convexity.common.layout import LanePosition, Layer, lane_layout, line_layout
 from convexity.common.options import Options
-from convexity.common.particle import Particles
+from convexity.common.particle import LANE_PARTICLE_DURATION, Particles
+from convexity.common.quality import QualityGovernor
 from convexity.common.skin import Skin
 
 
@@ -18,12 +19,12 @@ def play_lane_effects(pos: LanePosition):
 
 def play_lane_sfx():
     if Options.sfx_enabled:
-        Effects.stage.play(SFX_DISTANCE)
+        play_sfx(Effects.stage, EffectPriority.LANE)
 
 
 def play_lane_particle(pos: LanePosition):
-    if Options.lane_effect_enabled:
+    if QualityGovernor.lane_effects and reserve_particle(EffectPriority.LANE, LANE_PARTICLE_DURATION):
         Particles.lane.spawn(
             lane_layout(pos),
-            duration=0.2,
+            duration=LANE_PARTICLE_DURATION,
         )
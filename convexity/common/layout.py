@@ -33,6 +33,8 @@ class Layer:
     NOTE = 3001
     ARROW = 3001 + 0.01
 
+    DEBUG = 4000
+
 
 @level_data
 class Layout:
@@ -57,9 +59,23 @@ class Layout:
 
     reference_length: float
 
+    # Options resolved once so the per-vertex and per-draw helpers below don't branch on them.
+    arc_tilt: bool
+    arc_angle_scale: float
+    angled_hitboxes: bool
+    vertical_notes: bool
+    lane_top: float
+    inverse_scale: float
+    preempt_time: float
+    extend_fade: bool
+    hidden_fade: bool
+    hidden_fade_start: float
+    hidden_fade_end: float
+
 
 def init_layout():
     Layout.scale = 0.4 * Options.stage_size
+    Layout.inverse_scale = 1 / Layout.scale
 
     Layout.judge_line_y = lerp(-1, 1, Options.judge_line_position)
     Layout.lane_length = Options.lane_length * (1.05 if Options.extend_lanes else 1)
@@ -75,6 +91,17 @@ def init_layout():
 
     Layout.stage_border_width = 0.125
 
+    Layout.arc_tilt = Options.arc and Options.stage_tilt > 0
+    Layout.arc_angle_scale = Layout.scale / (Layout.vanishing_point.y - Layout.judge_line_y)
+    Layout.angled_hitboxes = Options.angled_hitboxes or Options.arc
+    Layout.vertical_notes = Options.vertical_notes
+    Layout.lane_top = Layout.lane_length if not Options.extend_lanes else 999
+    Layout.preempt_time = 5 / Options.note_speed * (1.05 if Options.extend_lanes else 1)
+    Layout.extend_fade = Options.extend_lanes
+    Layout.hidden_fade = Options.hidden != 0
+    Layout.hidden_fade_start = 1 - Options.hidden - 0.1
+    Layout.hidden_fade_end = 1 - Options.hidden + 0.1
+
     # This empirically works well enough. There isn't a particular reason for this formula.
     Layout.approach_distance = 99 ** asin(Options.linear_approach) - 1
     Layout.transform @= (
@@ -85,7 +112,7 @@ def init_layout():
     Layout.inverse_transform @= (
         Transform2d.new()
         .inverse_perspective_y(Layout.judge_line_y, Layout.vanishing_point)
-        .scale(Vec2(1 / Layout.scale, 1 / Layout.scale))
+        .scale(Vec2(Layout.inverse_scale, Layout.inverse_scale))
     )
     Layout.lane_max_screen_y = Layout.transform.transform_vec(Vec2(0, Layout.lane_length)).y
     Layout.approach_1_screen_y = Layout.transform.transform_vec(
@@ -141,6 +168,14 @@ def lane_to_pos(lane: float, width: float = 1) -> LanePosition:
     return LanePosition(left=lane - half_width, right=lane + half_width)
 
 
+# transform_vec calls made by each layout, for the debug counters.
+QUAD_TRANSFORMS = 4
+
+
+def note_layout_transforms() -> int:
+    return 2 if Layout.vertical_notes else QUAD_TRANSFORMS
+
+
 def transform_quad(quad: QuadLike) -> Quad:
     return Quad(
         bl=transform_vec(quad.bl),
@@ -152,9 +187,8 @@ def transform_quad(quad: QuadLike) -> Quad:
 
 def transform_vec(vec: Vec2) -> Vec2:
     result = zeros(Vec2)
-    if Options.arc and Options.stage_tilt > 0:
-        vanishing_point_h = Layout.vanishing_point.y - Layout.judge_line_y
-        angle = vec.x / vanishing_point_h * Layout.scale
+    if Layout.arc_tilt:
+        angle = vec.x * Layout.arc_angle_scale
         vec = Layout.transform.transform_vec(vec)
         h = Layout.vanishing_point.y - vec.y
         result @= Layout.vanishing_point + Vec2(h * sin(angle), -h * cos(angle))
@@ -168,7 +202,7 @@ def lane_layout(pos: LanePosition) -> Quad:
         l=pos.left,
         r=pos.right,
         b=Layout.min_safe_y - Layout.note_height / 2,
-        t=Layout.lane_length if not Options.extend_lanes else 999,
+        t=Layout.lane_top,
     )
     return transform_quad(base)
 
@@ -183,7 +217,7 @@ def lane_hitbox_layout(pos: LanePosition) -> Quad:
 
 def note_layout(pos: LanePosition, y: float) -> Quad:
     result = zeros(Quad)
-    if Options.vertical_notes:
+    if Layout.vertical_notes:
         scaled_pos = pos.scale_centered(Options.note_size)
         ml = transform_vec(Vec2(scaled_pos.left, y))
         mr = transform_vec(Vec2(scaled_pos.right, y))
@@ -282,7 +316,7 @@ def lane_hitbox_pos(lane: float, leniency: float = 1, direction: float = 0) -> L
 
 def lane_hitbox(pos: LanePosition) -> Quad:
     result = zeros(Quad)
-    if Options.angled_hitboxes or Options.arc:
+    if Layout.angled_hitboxes:
         result @= lane_hitbox_layout(pos)
     else:
         result @= Rect(l=pos.left * Layout.scale, r=pos.right * Layout.scale, b=-1, t=1).as_quad()
@@ -290,7 +324,7 @@ def lane_hitbox(pos: LanePosition) -> Quad:
 
 
 def preempt_time() -> float:
-    return 5 / Options.note_speed * (1.05 if Options.extend_lanes else 1)
+    return Layout.preempt_time
 
 
 def note_y(scaled_time: float, target_scaled_time: float) -> float:
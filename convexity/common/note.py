@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from enum import IntEnum
 from math import floor, pi
+from typing import Self
 
-from sonolus.script.bucket import Judgment, JudgmentWindow
+from sonolus.script.array import Array
+from sonolus.script.bucket import Bucket, Judgment, JudgmentWindow
 from sonolus.script.easing import ease_out_cubic, ease_out_quad
 from sonolus.script.effect import Effect
+from sonolus.script.globals import level_data
 from sonolus.script.interval import lerp, remap, unlerp
 from sonolus.script.particle import Particle, ParticleHandle
 from sonolus.script.quad import Quad
@@ -16,9 +19,10 @@ from sonolus.script.values import copy, zeros
 from sonolus.script.vec import Vec2
 
 from convexity.common.buckets import Buckets, note_judgment_window, tick_judgment_window
-from convexity.common.effect import SFX_DISTANCE, Effects
+from convexity.common.effect import EffectPriority, Effects, play_sfx, reserve_particle, schedule_sfx
 from convexity.common.layout import (
     EPSILON,
+    QUAD_TRANSFORMS,
     LanePosition,
     Layer,
     Layout,
@@ -26,13 +30,15 @@ from convexity.common.layout import (
     connector_layout,
     lane_layout,
     note_layout,
+    note_layout_transforms,
     note_particle_layout,
     sim_line_layout,
     transform_quad,
     transform_vec,
 )
 from convexity.common.options import Options
-from convexity.common.particle import Particles
+from convexity.common.particle import LANE_PARTICLE_DURATION, NOTE_PARTICLE_DURATION, Particles
+from convexity.common.quality import QualityGovernor
 from convexity.common.skin import Skin
 
 
@@ -159,39 +165,135 @@ def note_hold_particle(variant: NoteVariant):
     return copy(Particles.hold)
 
 
+NOTE_KIND_COUNT = 2 * len(NoteVariant)
+
+
+class NoteKind(Record):
+    window: JudgmentWindow
+    bucket: Bucket
+    body_sprite: Sprite
+    arrow_sprite: Sprite
+    head_sprite: Sprite
+    connector_sprite: Sprite
+    particle: Particle
+    hold_particle: Particle
+
+
+note_kinds = level_data(Array[NoteKind, NOTE_KIND_COUNT])
+
+
+def note_kind_index(variant: NoteVariant, direction: float) -> int:
+    # Only directional flicks look different by direction, but every variant gets both slots to keep this simple.
+    return variant * 2 + (1 if direction > 0 else 0)
+
+
+def init_note_kinds():
+    for i in range(NOTE_KIND_COUNT):
+        variant = i // 2
+        direction = i % 2
+        note_kinds[i].window @= note_window(variant)
+        note_kinds[i].bucket @= note_bucket(variant)
+        note_kinds[i].body_sprite @= note_body_sprite(variant, direction)
+        note_kinds[i].arrow_sprite @= note_arrow_sprite(variant, direction)
+        note_kinds[i].head_sprite @= note_head_sprite(variant)
+        note_kinds[i].connector_sprite @= note_connector_sprite(variant)
+        note_kinds[i].particle @= note_particle(variant, direction)
+        note_kinds[i].hold_particle @= note_hold_particle(variant)
+
+
+# Hidden anchors folded into the next note of a slide. The connector bends at each of them.
+CONTROL_POINT_COUNT = 2
+
+
+class ControlPoint(Record):
+    beat: float
+    lane: float
+
+
+class NoteFlag(IntEnum):
+    INPUT_FINISHED = 1
+    FINISHED = 2
+    STARTED = 4
+    # Visibility is kept in the highest bits so it can be cleared in one go with a modulo.
+    BODY_VISIBLE = 8
+    CONNECTOR_VISIBLE = 16
+    SIM_LINE_VISIBLE = 32
+
+
+def has_flag(flags: int, flag: NoteFlag) -> bool:
+    return (flags // flag) % 2 == 1
+
+
+def set_flag(flags: int, flag: NoteFlag, value: bool) -> int:
+    return flags - (flag if has_flag(flags, flag) else 0) + (flag if value else 0)
+
+
+def with_visibility(flags: int, body: bool, connector: bool, sim_line: bool) -> int:
+    return (
+        flags % NoteFlag.BODY_VISIBLE
+        + (NoteFlag.BODY_VISIBLE if body else 0)
+        + (NoteFlag.CONNECTOR_VISIBLE if connector else 0)
+        + (NoteFlag.SIM_LINE_VISIBLE if sim_line else 0)
+    )
+
+
+def y_on_stage(y: float) -> bool:
+    return Layout.min_safe_y <= y <= Layout.lane_length
+
+
+def span_on_stage(y: float, other_y: float) -> bool:
+    if y < Layout.min_safe_y and other_y < Layout.min_safe_y:
+        return False
+    return not (y > Layout.lane_length and other_y > Layout.lane_length)
+
+
 def y_to_alpha(y: float):
     progress = unlerp(
         Layout.lane_length,
         0,
         y,
     )
-    if Options.extend_lanes and 0.0 <= progress <= 0.2:
+    if Layout.extend_fade and 0.0 <= progress <= 0.2:
         return ease_out_cubic(remap(0.0, 0.2, 0, 1, progress))
-    if Options.hidden != 0 and progress > 1 - Options.hidden - 0.1:
-        return ease_out_cubic(remap(1 - Options.hidden - 0.1, 1 - Options.hidden + 0.1, 1, 0, progress))
+    if Layout.hidden_fade and progress > Layout.hidden_fade_start:
+        return ease_out_cubic(remap(Layout.hidden_fade_start, Layout.hidden_fade_end, 1, 0, progress))
     return 1
 
 
+class DrawCount(Record):
+    sprites: int
+    transforms: int
+
+    def __add__(self, other: Self) -> Self:
+        return DrawCount(sprites=self.sprites + other.sprites, transforms=self.transforms + other.transforms)
+
+
 def draw_note_body(
     sprite: Sprite,
     pos: LanePosition,
     y: float,
-):
-    if not (Layout.min_safe_y <= y <= Layout.lane_length):
-        return
+) -> DrawCount:
+    result = zeros(DrawCount)
+    if not y_on_stage(y):
+        return result
     layout = note_layout(pos, y)
     sprite.draw(layout, z=Layer.NOTE - y + pos.mid / 1000, a=y_to_alpha(y))
+    result @= DrawCount(sprites=1, transforms=note_layout_transforms())
+    return result
 
 
 def draw_note_head(
     sprite: Sprite,
     pos: LanePosition,
     y: float,
-):
-    if not (Layout.min_safe_y <= y <= Layout.lane_length):
-        return
+) -> DrawCount:
+    result = zeros(DrawCount)
+    if not y_on_stage(y):
+        return result
     layout = note_layout(pos, y)
     sprite.draw(layout, z=Layer.NOTE_HEAD - y + pos.mid / 1000, a=y_to_alpha(y))
+    result @= DrawCount(sprites=1, transforms=note_layout_transforms())
+    return result
 
 
 def draw_note_connector(
@@ -200,7 +302,8 @@ def draw_note_connector(
     y: float,
     prev_pos: LanePosition,
     prev_y: float,
-):
+) -> DrawCount:
+    result = zeros(DrawCount)
     if Options.boxy_sliders and pos != prev_pos:
         scaled_pos = pos.scale_centered(Options.note_size)
         scaled_prev_pos = prev_pos.scale_centered(Options.note_size)
@@ -214,13 +317,12 @@ def draw_note_connector(
         elif scaled_pos.left == horizontal_pos.left:
             horizontal_pos.left = scaled_pos.right
         horizontal_y = prev_y + vertical_direction * horizontal_height
-        _draw_horizontal_note_connector(
+        result @= _draw_horizontal_note_connector(
             sprite,
             horizontal_pos,
             horizontal_y,
             prev_y,
-        )
-        _draw_note_connector(
+        ) + _draw_note_connector(
             sprite,
             pos,
             y,
@@ -228,7 +330,8 @@ def draw_note_connector(
             prev_y,
         )
     else:
-        _draw_note_connector(sprite, pos, y, prev_pos, prev_y)
+        result @= _draw_note_connector(sprite, pos, y, prev_pos, prev_y)
+    return result
 
 
 def _draw_note_connector(
@@ -237,11 +340,10 @@ def _draw_note_connector(
     y: float,
     prev_pos: LanePosition,
     prev_y: float,
-):
-    if prev_y < Layout.min_safe_y and y < Layout.min_safe_y:
-        return
-    if prev_y > Layout.lane_length and y > Layout.lane_length:
-        return
+) -> DrawCount:
+    result = zeros(DrawCount)
+    if not span_on_stage(y, prev_y):
+        return result
 
     if abs(prev_y - y) < EPSILON:
         y = prev_y - EPSILON
@@ -259,7 +361,7 @@ def _draw_note_connector(
         unlerp(prev_y, y, clamped_y),
     ).scale_centered(Options.note_size)
 
-    arc_quality = Options.arc_quality
+    arc_quality = QualityGovernor.arc_quality
     n_segments = (
         floor(abs(clamped_pos.mid - clamped_prev_pos.mid) * arc_quality * Options.arc)
         + floor(abs(clamped_y - clamped_prev_y) * arc_quality)
@@ -281,6 +383,8 @@ def _draw_note_connector(
             z=Layer.CONNECTOR - y + pos.mid / 1000,
             a=Options.connector_alpha * y_to_alpha((segment_y + segment_prev_y) / 2),
         )
+    result @= DrawCount(sprites=n_segments, transforms=n_segments * QUAD_TRANSFORMS)
+    return result
 
 
 def _draw_horizontal_note_connector(
@@ -288,11 +392,10 @@ def _draw_horizontal_note_connector(
     pos: LanePosition,
     y: float,
     prev_y: float,
-):
-    if prev_y < Layout.min_safe_y and y < Layout.min_safe_y:
-        return
-    if prev_y > Layout.lane_length and y > Layout.lane_length:
-        return
+) -> DrawCount:
+    result = zeros(DrawCount)
+    if not span_on_stage(y, prev_y):
+        return result
 
     if abs(prev_y - y) < EPSILON:
         y = prev_y - EPSILON
@@ -302,7 +405,7 @@ def _draw_horizontal_note_connector(
     bl = Vec2(pos.left, prev_y)
     br = Vec2(pos.right, prev_y)
 
-    arc_quality = Options.arc_quality
+    arc_quality = QualityGovernor.arc_quality
     n_segments = floor(abs(pos.left - pos.right) * arc_quality * Options.arc) + 1
     for i in range(n_segments):
         segment_tl = lerp(tl, tr, i / n_segments)
@@ -320,6 +423,8 @@ def _draw_horizontal_note_connector(
             z=Layer.CONNECTOR - y + pos.mid / 1000,
             a=Options.connector_alpha * y_to_alpha((segment_bl.y + segment_br.y) / 2),
         )
+    result @= DrawCount(sprites=n_segments, transforms=n_segments * QUAD_TRANSFORMS)
+    return result
 
 
 def draw_note_sim_line(
@@ -327,14 +432,13 @@ def draw_note_sim_line(
     y: float,
     sim_pos: LanePosition,
     sim_y: float,
-):
+) -> DrawCount:
+    result = zeros(DrawCount)
     if not Options.sim_lines_enabled:
-        return
+        return result
 
-    if y < Layout.min_safe_y and sim_y < Layout.min_safe_y:
-        return
-    if y > Layout.lane_length and sim_y > Layout.lane_length:
-        return
+    if not span_on_stage(y, sim_y):
+        return result
 
     clamped_sim_y = clamp_y_to_stage(sim_y)
     clamped_y = clamp_y_to_stage(y)
@@ -349,11 +453,13 @@ def draw_note_sim_line(
         unlerp(y, sim_y, clamped_y) if abs(sim_y - y) > EPSILON else 0,
     ).scale_centered(Options.note_size)
 
-    arc_quality = Options.arc_quality
+    arc_quality = QualityGovernor.arc_quality
     n_segments = (
         floor(abs(clamped_pos.mid - clamped_sim_pos.mid) * arc_quality * Options.arc)
         + floor(abs(clamped_y - clamped_sim_y) * arc_quality)
         + 1
+        if not QualityGovernor.simple_sim_lines
+        else 1
     )
     for i in range(n_segments):
         segment_pos = lerp(clamped_pos, clamped_sim_pos, (i + 1) / n_segments)
@@ -369,6 +475,8 @@ def draw_note_sim_line(
         Skin.sim_line.draw(
             layout, z=Layer.SIM_LINE - y + pos.mid / 1000, a=y_to_alpha((segment_y + segment_prev_y) / 2)
         )
+    result @= DrawCount(sprites=n_segments, transforms=n_segments * QUAD_TRANSFORMS)
+    return result
 
 
 def draw_note_arrow(
@@ -376,9 +484,10 @@ def draw_note_arrow(
     direction: float,
     pos: LanePosition,
     y: float,
-):
-    if not (Layout.min_safe_y <= y <= Layout.lane_length):
-        return
+) -> DrawCount:
+    result = zeros(DrawCount)
+    if not y_on_stage(y):
+        return result
 
     period = 0.3
     count = max(abs(direction), 1)
@@ -433,6 +542,8 @@ def draw_note_arrow(
                     tr=up_layout.tl,
                 )
         sprite.draw(layout, z=Layer.ARROW - y + pos.mid / 1000, a=alpha * y_to_alpha(y))
+    result @= DrawCount(sprites=count, transforms=count * (2 if direction == 0 else note_layout_transforms()))
+    return result
 
 
 def draw_swing_arrow(
@@ -440,11 +551,12 @@ def draw_swing_arrow(
     direction: float,
     pos: LanePosition,
     y: float,
-):
-    if not (Layout.min_safe_y <= y <= Layout.lane_length):
-        return
+) -> DrawCount:
+    result = zeros(DrawCount)
+    if not y_on_stage(y):
+        return result
 
-    y_offset = 0.4 if Options.vertical_notes or Options.stage_tilt == 0 else 0
+    y_offset = 0.4 if Layout.vertical_notes or Options.stage_tilt == 0 else 0
     lane = pos.mid
     base_bl = transform_vec(Vec2(lane - 0.5 * Options.note_size, y))
     base_br = transform_vec(Vec2(lane + 0.5 * Options.note_size, y))
@@ -464,6 +576,8 @@ def draw_swing_arrow(
     elif direction < 0:
         layout @= layout.rotate_centered(pi / 2)
     sprite.draw(layout, z=Layer.ARROW - y + lane / 1000, a=y_to_alpha(y))
+    result @= DrawCount(sprites=1, transforms=2)
+    return result
 
 
 def flick_velocity_threshold(direction: float = 0):
@@ -513,7 +627,8 @@ def play_watch_hit_effects(
     note_particle: Particle,
     pos: LanePosition,
 ):
-    play_hit_particle(note_particle, pos)
+    # Called from terminate, which can't write level memory, so these bypass the effect budget.
+    play_hit_particle(note_particle, pos, budgeted=False)
 
 
 def schedule_watch_hit_effects(
@@ -530,7 +645,7 @@ def play_hit_sfx(variant: NoteVariant, judgment: Judgment):
     effect = note_hit_sfx(variant, judgment)
     if effect.id == 0:
         return
-    effect.play(SFX_DISTANCE)
+    play_sfx(effect, EffectPriority.NOTE)
 
 
 def schedule_auto_hit_sfx(variant: NoteVariant, judgment: Judgment, target_time: float):
@@ -545,51 +660,47 @@ def schedule_hit_sfx(variant: NoteVariant, judgment: Judgment, target_time: floa
     effect = note_hit_sfx(variant, judgment)
     if effect.id == 0:
         return
-    effect.schedule(target_time, SFX_DISTANCE)
+    schedule_sfx(effect, target_time)
 
 
 def play_hit_particle(
     note_particle: Particle,
     pos: LanePosition,
+    budgeted: bool = True,
 ):
-    if Options.note_effect_enabled:
+    if Options.note_effect_enabled and (not budgeted or reserve_particle(EffectPriority.NOTE, NOTE_PARTICLE_DURATION)):
         note_particle.spawn(
             note_particle_layout(pos),
-            duration=0.5,
+            duration=NOTE_PARTICLE_DURATION,
         )
-    if Options.lane_effect_enabled:
+    if QualityGovernor.lane_effects and (not budgeted or reserve_particle(EffectPriority.LANE, LANE_PARTICLE_DURATION)):
         Particles.lane.spawn(
             lane_layout(pos),
-            duration=0.2,
+            duration=LANE_PARTICLE_DURATION,
         )
 
 
 class HoldHandle(Record):
     handle: ParticleHandle
-
-    @property
-    def is_active(self):
-        return self.handle.id != 0
+    pos: LanePosition
 
     def update(self, particle: Particle, pos: LanePosition):
         if not Options.note_effect_enabled:
             return
         if self.handle.id == 0:
+            if not reserve_particle(EffectPriority.HOLD, 0):
+                return
             self.handle @= particle.spawn(
                 note_particle_layout(pos),
                 duration=1.0,
                 loop=True,
             )
-        else:
+            self.pos @= pos
+        elif pos != self.pos:
             self.handle.move(note_particle_layout(pos))
+            self.pos @= pos
 
     def destroy(self):
         if self.handle.id != 0:
             self.handle.destroy()
             self.handle.id = 0
-
-    def take(self, other: HoldHandle):
-        if self != other:
-            self.destroy()
-            self.handle = other.handle
-        other.handle.id = 0
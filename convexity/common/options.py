@@ -150,6 +150,16 @@ class Options:
         scope="convexity",
         default=True,
     )
+    adaptive_quality: bool = toggle_option(
+        name="Adaptive Quality",
+        scope="convexity",
+        default=False,
+    )
+    effect_budget: bool = toggle_option(
+        name="Effect Budget",
+        scope="convexity",
+        default=False,
+    )
     judge_line_position: float = slider_option(
         name=StandardText.JUDGELINE_POSITION,
         scope="convexity",
@@ -229,3 +239,8 @@ class Options:
         scope="convexity",
         default=False,
     )
+    debug_counters: bool = toggle_option(
+        name="Debug Counters",
+        scope="convexity",
+        default=False,
+    )
@@ -1,5 +1,8 @@
 from sonolus.script.particle import StandardParticle, particles
 
+NOTE_PARTICLE_DURATION = 0.5
+LANE_PARTICLE_DURATION = 0.2
+
 
 @particles
 class Particles:
@@ -0,0 +1,57 @@
+from sonolus.script.globals import level_memory
+from sonolus.script.interval import clamp, lerp
+from sonolus.script.runtime import delta_time
+
+from convexity.common.options import Options
+
+# Frame time to stay under, and the lower one to get back to before quality is raised again.
+FRAME_TIME_BUDGET = 1 / 50
+FRAME_TIME_RECOVERY = 1 / 57
+FRAME_TIME_SMOOTHING = 0.1
+ADJUST_INTERVAL = 0.5
+MAX_QUALITY_LEVEL = 3
+
+
+@level_memory
+class QualityGovernor:
+    frame_time: float
+    level: int
+    since_adjust: float
+
+    arc_quality: int
+    lane_effects: bool
+    simple_sim_lines: bool
+
+
+def init_quality():
+    QualityGovernor.frame_time = 1 / 60
+    QualityGovernor.level = 0
+    QualityGovernor.since_adjust = 0
+    apply_quality_level()
+
+
+def apply_quality_level():
+    # Each level halves connector tessellation; lane particles go first and sim lines go straight next.
+    level = QualityGovernor.level
+    QualityGovernor.arc_quality = max(1, Options.arc_quality // (2**level))
+    QualityGovernor.lane_effects = Options.lane_effect_enabled and level == 0
+    QualityGovernor.simple_sim_lines = level >= 2
+
+
+def update_quality():
+    if not Options.adaptive_quality:
+        return
+    # Skips in watch mode and pauses can produce huge or negative deltas, which shouldn't swamp the average.
+    frame_time = clamp(delta_time(), 0, 0.1)
+    QualityGovernor.frame_time = lerp(QualityGovernor.frame_time, frame_time, FRAME_TIME_SMOOTHING)
+    QualityGovernor.since_adjust += frame_time
+    if QualityGovernor.since_adjust < ADJUST_INTERVAL:
+        return
+    if QualityGovernor.frame_time > FRAME_TIME_BUDGET and QualityGovernor.level < MAX_QUALITY_LEVEL:
+        QualityGovernor.level += 1
+    elif QualityGovernor.frame_time < FRAME_TIME_RECOVERY and QualityGovernor.level > 0:
+        QualityGovernor.level -= 1
+    else:
+        return
+    QualityGovernor.since_adjust = 0
+    apply_quality_level()
@@ -0,0 +1,262 @@
+import gzip
+import json
+import sys
+from collections import Counter
+from math import floor
+from pathlib import Path
+from statistics import mean
+from typing import NamedTuple
+
+from sonolus.script.level import LevelData
+
+from convexity.common.note import NoteVariant
+from convexity.convert.timing import DEFAULT_PREEMPT_TIME, Timeline
+from convexity.convert.utils import EntityData, parse_entities
+from convexity.play.bpm import BpmChange
+from convexity.play.note import Note
+from convexity.play.timescale import TimescaleChange
+
+NOTE_ARCHETYPES = {"Note", "UnscoredNote"}
+
+
+class ChartNote(NamedTuple):
+    beat: float
+    lane: float
+    variant: NoteVariant
+    prev: int
+    sim: int
+    # (beat, lane) of the control points the connector from prev passes through, in order.
+    controls: tuple[tuple[float, float], ...] = ()
+
+
+class Chart(NamedTuple):
+    archetype_counts: dict[str, int]
+    bpm_changes: list[tuple[float, float]]
+    timescale_changes: list[tuple[float, float]]
+    notes: list[ChartNote]
+
+    @property
+    def timeline(self) -> Timeline:
+        return Timeline(self.bpm_changes, self.timescale_changes)
+
+
+def chart_from_entities(entities: list[EntityData]) -> Chart:
+    note_indexes = {}
+    for i, (archetype, _) in enumerate(entities):
+        if archetype in NOTE_ARCHETYPES:
+            note_indexes[i] = len(note_indexes)
+    bpm_changes = []
+    timescale_changes = []
+    notes = []
+    for archetype, d in entities:
+        match archetype:
+            case "#BPM_CHANGE":
+                bpm_changes.append((d["#BEAT"], d["#BPM"]))
+            case "TimescaleChange":
+                timescale_changes.append((d.get("beat", 0), d.get("scale", 0)))
+            case _ if archetype in NOTE_ARCHETYPES:
+                notes.append(
+                    ChartNote(
+                        beat=d.get("beat", 0),
+                        lane=d.get("lane", 0),
+                        variant=NoteVariant(d.get("variant", 0)),
+                        prev=note_indexes.get(d.get("prev_note_ref", 0), -1),
+                        sim=note_indexes.get(d.get("sim_note_ref", 0), -1),
+                        controls=tuple(
+                            (d.get(f"control_points[{i}].beat", 0), d.get(f"control_points[{i}].lane", 0))
+                            for i in range(int(d.get("control_count", 0)))
+                        ),
+                    )
+                )
+    return Chart(
+        archetype_counts=dict(Counter(archetype for archetype, _ in entities)),
+        bpm_changes=bpm_changes,
+        timescale_changes=timescale_changes,
+        notes=notes,
+    )
+
+
+def chart_from_level_data(level_data: LevelData) -> Chart:
+    note_indexes = {id(e): i for i, e in enumerate(e for e in level_data.entities if isinstance(e, Note))}
+
+    def ref_index(ref) -> int:
+        return note_indexes.get(id(getattr(ref, "_ref_", None)), -1)
+
+    bpm_changes = []
+    timescale_changes = []
+    notes = []
+    for entity in level_data.entities:
+        match entity:
+            case BpmChange():
+                bpm_changes.append((entity.beat, entity.bpm))
+            case TimescaleChange():
+                timescale_changes.append((entity.beat, entity.scale))
+            case Note():
+                notes.append(
+                    ChartNote(
+                        beat=entity.beat,
+                        lane=entity.lane,
+                        variant=NoteVariant(entity.variant),
+                        prev=ref_index(entity.prev_note_ref),
+                        sim=ref_index(entity.sim_note_ref),
+                        controls=tuple(
+                            (entity.control_points[i].beat, entity.control_points[i].lane)
+                            for i in range(entity.control_count)
+                        ),
+                    )
+                )
+    return Chart(
+        archetype_counts=dict(Counter(archetype_name(e) for e in level_data.entities)),
+        bpm_changes=bpm_changes,
+        timescale_changes=timescale_changes,
+        notes=notes,
+    )
+
+
+def archetype_name(entity) -> str:
+    return str(type(entity).name or type(entity).__name__)
+
+
+def analyze_chart(chart: Chart, preempt_time: float = DEFAULT_PREEMPT_TIME) -> dict:
+    timeline = chart.timeline
+    times = [timeline.beat_to_time(note.beat) for note in chart.notes]
+    hit_times = sorted(t for t, note in zip(times, chart.notes, strict=True) if note.variant != NoteVariant.HOLD_ANCHOR)
+    anchor_count = len(chart.notes) - len(hit_times)
+    duration = hit_times[-1] - hit_times[0] if hit_times else 0
+
+    notes_per_second = [0] * (floor(hit_times[-1]) + 1 if hit_times else 0)
+    for t in hit_times:
+        notes_per_second[max(0, floor(t))] += 1
+
+    # Two pointers over the sorted times give the densest one second window, not just the densest bucket.
+    peak_density = 0
+    peak_density_time = 0
+    start = 0
+    for end, t in enumerate(hit_times):
+        while hit_times[start] <= t - 1:
+            start += 1
+        if end - start + 1 > peak_density:
+            peak_density = end - start + 1
+            peak_density_time = hit_times[start]
+
+    chord_sizes = Counter(
+        Counter(note.beat for note in chart.notes if note.variant != NoteVariant.HOLD_ANCHOR).values()
+    )
+
+    hold_spans = chain_spans(chart.notes, times)
+    events = sorted([(start, 1) for start, _ in hold_spans] + [(end, -1) for _, end in hold_spans])
+    concurrent_holds = 0
+    peak_holds = 0
+    for _, delta in events:
+        concurrent_holds += delta
+        peak_holds = max(peak_holds, concurrent_holds)
+
+    scale_segments = timeline.scale_segments(hit_times[0], hit_times[-1]) if hit_times else []
+    total_duration = sum(d for d, _ in scale_segments)
+    if total_duration > 0:
+        scale_mean = sum(d * s for d, s in scale_segments) / total_duration
+        scale_variance = sum(d * (s - scale_mean) ** 2 for d, s in scale_segments) / total_duration
+    else:
+        scale_mean = 1
+        scale_variance = 0
+
+    return {
+        "entity_count": sum(chart.archetype_counts.values()),
+        "archetype_counts": chart.archetype_counts,
+        "note_count": len(hit_times),
+        "anchor_count": anchor_count,
+        "duration": duration,
+        "average_density": len(hit_times) / duration if duration > 0 else len(hit_times),
+        "peak_density": peak_density,
+        "peak_density_time": peak_density_time,
+        "notes_per_second": notes_per_second,
+        "chord_sizes": {str(size): count for size, count in sorted(chord_sizes.items())},
+        "max_chord_size": max(chord_sizes, default=0),
+        "hold_count": len(hold_spans),
+        "peak_concurrent_holds": peak_holds,
+        "timescale_change_count": len(chart.timescale_changes),
+        "scale_mean": scale_mean,
+        "scale_variance": scale_variance,
+        "scale_min": min((s for _, s in scale_segments), default=1),
+        "scale_max": max((s for _, s in scale_segments), default=1),
+        "peak_visible_notes": peak_visible_notes(timeline, times, preempt_time),
+    }
+
+
+def chain_spans(notes: list[ChartNote], times: list[float]) -> list[tuple[float, float]]:
+    has_next = {note.prev for note in notes if note.prev >= 0}
+    spans = []
+    for i, note in enumerate(notes):
+        if note.prev < 0 or i in has_next:
+            continue
+        head = i
+        while notes[head].prev >= 0:
+            head = notes[head].prev
+        spans.append((times[head], times[i]))
+    return spans
+
+
+def peak_visible_notes(timeline: Timeline, times: list[float], preempt_time: float) -> int:
+    events = sorted([(timeline.spawn_time(t, preempt_time), 1) for t in times] + [(t, -1) for t in times])
+    visible = 0
+    peak = 0
+    for _, delta in events:
+        visible += delta
+        peak = max(peak, visible)
+    return peak
+
+
+def analyze_level_data(level_data: LevelData, preempt_time: float = DEFAULT_PREEMPT_TIME) -> dict:
+    return analyze_chart(chart_from_level_data(level_data), preempt_time)
+
+
+def analyze_level_dir(level_dir: Path, preempt_time: float = DEFAULT_PREEMPT_TIME) -> dict:
+    data = json.loads(gzip.decompress((level_dir / "data").read_bytes()).decode("utf-8"))
+    return analyze_chart(chart_from_entities(parse_entities(data["entities"])), preempt_time)
+
+
+def aggregate_reports(reports: dict[str, dict]) -> dict:
+    if not reports:
+        return {"level_count": 0}
+
+    def summary(key: str) -> dict:
+        values = [report[key] for report in reports.values()]
+        return {"mean": mean(values), "max": max(values)}
+
+    return {
+        "level_count": len(reports),
+        "entity_count": summary("entity_count"),
+        "note_count": summary("note_count"),
+        "anchor_count": summary("anchor_count"),
+        "peak_density": summary("peak_density"),
+        "peak_concurrent_holds": summary("peak_concurrent_holds"),
+        "peak_visible_notes": summary("peak_visible_notes"),
+        "scale_variance": summary("scale_variance"),
+        "densest_levels": sorted(reports, key=lambda name: reports[name]["peak_density"], reverse=True)[:20],
+        "largest_levels": sorted(reports, key=lambda name: reports[name]["entity_count"], reverse=True)[:20],
+    }
+
+
+def analyze_export_dir(levels_dir: Path, output_dir: Path, preempt_time: float = DEFAULT_PREEMPT_TIME) -> dict:
+    reports = {}
+    (output_dir / "levels").mkdir(parents=True, exist_ok=True)
+    for level_dir in sorted(levels_dir.iterdir()):
+        if not (level_dir / "data").exists():
+            continue
+        report = analyze_level_dir(level_dir, preempt_time)
+        (output_dir / "levels" / f"{level_dir.name}.json").write_text(json.dumps(report), encoding="utf-8")
+        reports[level_dir.name] = report
+    aggregate = aggregate_reports(reports)
+    (output_dir / "aggregate.json").write_text(json.dumps(aggregate, indent=2), encoding="utf-8")
+    return aggregate
+
+
+def main():
+    levels_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("downloads") / "levels"
+    output_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("downloads") / "analysis"
+    aggregate = analyze_export_dir(levels_dir, output_dir)
+    print(json.dumps(aggregate, indent=2))
+
+
+if __name__ == "__main__":
+    main()
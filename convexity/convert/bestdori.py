@@ -1,15 +1,19 @@
-import itertools
-
 from sonolus.script.level import Level, LevelData
 
 from convexity.common.note import NoteVariant
+from convexity.convert.budget import DEFAULT_BUDGET, Budget, enforce_budget
+from convexity.convert.controls import control_point_array, fold_anchor_runs
+from convexity.convert.sim import link_sim_notes
+from convexity.convert.simplify import simplify_chain
+from convexity.convert.timescale import TimescaleGroups
+from convexity.convert.timing import fill_note_times, spawn_sorted_entities
 from convexity.convert.utils import get_bytes, get_json
 from convexity.play.bpm import BpmChange
 from convexity.play.init import Init
 from convexity.play.lane import Lane
 from convexity.play.note import Note, UnscoredNote
 from convexity.play.stage import Stage
-from convexity.play.timescale import TimescaleChange, TimescaleGroup
+from convexity.play.timescale import TimescaleChange
 
 difficulty_names = {
     "0": "easy",
@@ -43,7 +47,11 @@ def get_bestdori_official(chart_id: int):
         )
 
 
-def convert_bestdori(data: list[dict]) -> LevelData:
+def convert_bestdori(
+    data: list[dict],
+    budget: Budget | None = DEFAULT_BUDGET,
+    anchor_tolerance: float | None = None,
+) -> LevelData:
     lane_count = 7
 
     def convert_lane(x: float) -> float:
@@ -63,10 +71,13 @@ def convert_bestdori(data: list[dict]) -> LevelData:
     ]
     notes = []
     bpm_changes = []
-    timescale_group = TimescaleGroup()
-    timescale_changes = [
-        TimescaleChange(beat=0, scale=1),
-    ]
+    timescale_groups = TimescaleGroups()
+    timescale_group = timescale_groups.add(
+        [
+            TimescaleChange(beat=0, scale=1),
+        ]
+    )
+    removed_anchor_count = 0
     for entry in data:
         match entry["type"]:
             case "BPM":
@@ -87,6 +98,16 @@ def convert_bestdori(data: list[dict]) -> LevelData:
                 )
             case "Slide" | "Long":
                 connections = entry["connections"]
+                if anchor_tolerance is not None:
+                    kept = simplify_chain(
+                        [(connection["beat"], connection["lane"]) for connection in connections],
+                        [connection.get("hidden", False) for connection in connections],
+                        anchor_tolerance,
+                    )
+                    removed_anchor_count += len(connections) - len(kept)
+                    connections = [connections[i] for i in kept]
+                controls = fold_anchor_runs([connection.get("hidden", False) for connection in connections])
+                folded = {j for run in controls.values() for j in run}
                 prev_note = Note(
                     variant=NoteVariant.HOLD_START,
                     beat=connections[0]["beat"],
@@ -95,6 +116,9 @@ def convert_bestdori(data: list[dict]) -> LevelData:
                 )
                 notes.append(prev_note)
                 for i, connection in enumerate(connections[1:], 1):
+                    if i in folded:
+                        continue
+                    run = controls.get(i, [])
                     if connection.get("flick", False):
                         variant = NoteVariant.FLICK
                     elif i == len(connections) - 1:
@@ -109,6 +133,10 @@ def convert_bestdori(data: list[dict]) -> LevelData:
                         lane=convert_lane(connection["lane"]),
                         timescale_group_ref=timescale_group.ref(),
                         prev_note_ref=prev_note.ref(),
+                        control_points=control_point_array(
+                            [(connections[j]["beat"], convert_lane(connections[j]["lane"])) for j in run]
+                        ),
+                        control_count=len(run),
                     )
                     notes.append(note)
                     prev_note = note
@@ -123,27 +151,25 @@ def convert_bestdori(data: list[dict]) -> LevelData:
                     )
                 )
 
-    notes_by_beat: dict[float, list[Note]] = {}
-    for note in notes:
-        notes_by_beat.setdefault(note.beat, []).append(note)
-    for group in notes_by_beat.values():
-        group.sort(key=lambda note: note.lane)
-        for a, b in itertools.pairwise(n for n in group if n.variant != NoteVariant.HOLD_ANCHOR):
-            a.sim_note_ref @= b.ref()
-
-    notes.sort(key=lambda note: note.beat)
+    link_sim_notes(notes)
+    fill_note_times(notes, bpm_changes)
 
-    return LevelData(
+    level_data = LevelData(
         bgm_offset=0,
-        entities=[
-            Init(
-                base_leniency=2.35,
-            ),
-            timescale_group,
-            *timescale_changes,
-            *stages,
-            *lanes,
-            *bpm_changes,
-            *notes,
-        ],
+        entities=spawn_sorted_entities(
+            [
+                Init(
+                    base_leniency=2.35,
+                ),
+                *timescale_groups.entities(),
+                *stages,
+                *lanes,
+                *bpm_changes,
+                *notes,
+            ]
+        ),
     )
+    if anchor_tolerance is not None:
+        print(f"Removed {removed_anchor_count} hidden anchors, {len(level_data.entities)} entities remaining")
+    enforce_budget(level_data, budget)
+    return level_data
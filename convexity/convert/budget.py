@@ -0,0 +1,166 @@
+from itertools import groupby
+from math import floor
+from typing import NamedTuple
+
+from sonolus.script.level import LevelData
+
+from convexity.convert.analysis import Chart, chart_from_level_data
+from convexity.convert.timing import DEFAULT_PREEMPT_TIME, Timeline
+
+# Defaults of the arc quality and lane length options, used to estimate how many quads a connector takes.
+ARC_QUALITY = 5
+LANE_LENGTH = 10
+
+
+class Budget(NamedTuple):
+    max_entities: int = 10000
+    max_spawned_notes: int = 150
+    max_connector_segments: int = 1500
+    preempt_time: float = DEFAULT_PREEMPT_TIME
+    reject: bool = False
+
+
+DEFAULT_BUDGET = Budget()
+
+
+class HotSpot(NamedTuple):
+    start_beat: float
+    end_beat: float
+    spawned_notes: int
+    connector_segments: int
+
+
+class BudgetReport(NamedTuple):
+    budget: Budget
+    entity_count: int
+    peak_spawned_notes: int
+    peak_connector_segments: int
+    hot_spots: list[HotSpot]
+
+    @property
+    def over_budget(self) -> bool:
+        return (
+            self.entity_count > self.budget.max_entities
+            or self.peak_spawned_notes > self.budget.max_spawned_notes
+            or self.peak_connector_segments > self.budget.max_connector_segments
+        )
+
+    def summary(self) -> str:
+        lines = [
+            f"entities {self.entity_count}/{self.budget.max_entities}, "
+            f"spawned notes {self.peak_spawned_notes}/{self.budget.max_spawned_notes}, "
+            f"connector segments {self.peak_connector_segments}/{self.budget.max_connector_segments}"
+        ]
+        lines.extend(
+            f"  beats {spot.start_beat:.2f}-{spot.end_beat:.2f}: "
+            f"{spot.spawned_notes} notes, {spot.connector_segments} connector segments"
+            for spot in self.hot_spots
+        )
+        return "\n".join(lines)
+
+
+class BudgetExceededError(ValueError):
+    def __init__(self, report: BudgetReport):
+        super().__init__(report.summary())
+        self.report = report
+
+
+def spawn_times(chart: Chart, timeline: Timeline, times: list[float], preempt_time: float) -> list[float]:
+    notes = chart.notes
+    own_spawns = [timeline.spawn_time(t, preempt_time) for t in times]
+    spawns = list(own_spawns)
+    # The engine spawns a note no later than its prev note and its whole sim chain, which shares a beat.
+    order = sorted(range(len(notes)), key=lambda i: notes[i].beat)
+    for _, group in groupby(order, key=lambda i: notes[i].beat):
+        group = list(group)
+        for i in group:
+            if notes[i].prev >= 0:
+                spawns[i] = min(spawns[i], own_spawns[notes[i].prev])
+        changed = True
+        while changed:
+            changed = False
+            for i in group:
+                j = notes[i].sim
+                if j >= 0 and spawns[i] != spawns[j]:
+                    spawns[i] = spawns[j] = min(spawns[i], spawns[j])
+                    changed = True
+    return spawns
+
+
+def connector_segments(lane: float, prev_lane: float, duration: float, preempt_time: float) -> int:
+    y_span = min(1, duration / preempt_time) * LANE_LENGTH if preempt_time > 0 else LANE_LENGTH
+    return floor(abs(lane - prev_lane) * ARC_QUALITY) + floor(y_span * ARC_QUALITY) + 1
+
+
+def check_budget(chart: Chart, budget: Budget = DEFAULT_BUDGET) -> BudgetReport:
+    timeline = chart.timeline
+    times = [timeline.beat_to_time(note.beat) for note in chart.notes]
+    spawns = spawn_times(chart, timeline, times, budget.preempt_time)
+
+    events = []
+    for i, note in enumerate(chart.notes):
+        segments = 0
+        if note.prev >= 0:
+            # Each control point starts a new connector, so the path is estimated one piece at a time.
+            prev = chart.notes[note.prev]
+            prev_lane = prev.lane
+            prev_time = times[note.prev]
+            for beat, lane in note.controls:
+                time = timeline.beat_to_time(beat)
+                segments += connector_segments(lane, prev_lane, time - prev_time, budget.preempt_time)
+                prev_lane = lane
+                prev_time = time
+            segments += connector_segments(note.lane, prev_lane, times[i] - prev_time, budget.preempt_time)
+        events.append((spawns[i], 1, segments))
+        events.append((times[i], -1, -segments))
+    events.sort()
+
+    spawned_notes = 0
+    segments = 0
+    peak_spawned_notes = 0
+    peak_segments = 0
+    hot_spots = []
+    hot_start = None
+    hot_notes = 0
+    hot_segments = 0
+    for t, note_delta, segment_delta in events:
+        spawned_notes += note_delta
+        segments += segment_delta
+        peak_spawned_notes = max(peak_spawned_notes, spawned_notes)
+        peak_segments = max(peak_segments, segments)
+        if spawned_notes > budget.max_spawned_notes or segments > budget.max_connector_segments:
+            if hot_start is None:
+                hot_start = t
+                hot_notes = 0
+                hot_segments = 0
+            hot_notes = max(hot_notes, spawned_notes)
+            hot_segments = max(hot_segments, segments)
+        elif hot_start is not None:
+            hot_spots.append(
+                HotSpot(
+                    start_beat=timeline.time_to_beat(hot_start),
+                    end_beat=timeline.time_to_beat(t),
+                    spawned_notes=hot_notes,
+                    connector_segments=hot_segments,
+                )
+            )
+            hot_start = None
+
+    return BudgetReport(
+        budget=budget,
+        entity_count=sum(chart.archetype_counts.values()),
+        peak_spawned_notes=peak_spawned_notes,
+        peak_connector_segments=peak_segments,
+        hot_spots=hot_spots,
+    )
+
+
+def enforce_budget(level_data: LevelData, budget: Budget | None = DEFAULT_BUDGET) -> BudgetReport | None:
+    if budget is None:
+        return None
+    report = check_budget(chart_from_level_data(level_data), budget)
+    if report.over_budget:
+        if budget.reject:
+            raise BudgetExceededError(report)
+        print(f"Level over budget: {report.summary()}")
+    return report
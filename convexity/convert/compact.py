@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+import math
+import sys
+from itertools import pairwise
+from pathlib import Path
+from typing import NamedTuple
+
+from convexity.convert.timing import Timeline
+from convexity.convert.utils import EntityData, parse_entities
+
+TICKS_PER_BEAT = 480
+BEAT_FIELDS = {"beat", "#BEAT"}
+BPM_CHANGE_ARCHETYPE = "#BPM_CHANGE"
+TARGET_TIME_FIELD = "target_time"
+# Matches the tolerance fill_note_times allows between a note's imported time and its beat.
+TIME_TOLERANCE = 1e-3
+
+
+def is_beat_field(name: str) -> bool:
+    # Control points are imported as records, so their beats are named like "control_points[0].beat".
+    return name in BEAT_FIELDS or name.endswith(".beat")
+
+
+class CompactResult(NamedTuple):
+    original_size: int
+    compact_size: int
+    ticks_per_beat: int | None
+
+
+def short_name(i: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    name = ""
+    while True:
+        i, d = divmod(i, len(digits))
+        name = digits[d] + name
+        if i == 0:
+            return name
+
+
+def bpm_timeline(entities: list[EntityData]) -> Timeline:
+    return Timeline(
+        [(e.data.get("#BEAT", 0), e.data.get("#BPM", 0)) for e in entities if e.archetype == BPM_CHANGE_ARCHETYPE], []
+    )
+
+
+def compact_value(name: str, value: float, ticks_per_beat: int | None) -> float:
+    if not math.isfinite(value):
+        return value
+    if ticks_per_beat and is_beat_field(name):
+        value = round(value * ticks_per_beat) / ticks_per_beat
+    if value == int(value):
+        value = int(value)
+    return value
+
+
+def compact_entities(entities: list[dict], ticks_per_beat: int | None = TICKS_PER_BEAT) -> list[dict]:
+    # Imported fields that are missing read as zero, and names only matter to entities that are referenced.
+    referenced = {d["ref"] for e in entities for d in e["data"] if "ref" in d}
+    names = {name: short_name(i) for i, name in enumerate(e["name"] for e in entities if e.get("name") in referenced)}
+    values = [
+        EntityData(
+            archetype=e["archetype"],
+            data={d["name"]: compact_value(d["name"], d["value"], ticks_per_beat) for d in e["data"] if "ref" not in d},
+        )
+        for e in entities
+    ]
+    if ticks_per_beat:
+        # Imported times skip the engine's BPM lookup, so they have to follow the quantized beats.
+        timeline = bpm_timeline(values)
+        for entity in values:
+            if entity.data.get(TARGET_TIME_FIELD):
+                time = timeline.beat_to_time(entity.data.get("beat", 0))
+                entity.data[TARGET_TIME_FIELD] = compact_value(TARGET_TIME_FIELD, time, None)
+    compacted = []
+    for e, entity in zip(entities, values, strict=True):
+        data = []
+        for d in e["data"]:
+            if "ref" in d:
+                data.append({"name": d["name"], "ref": names.get(d["ref"], d["ref"])})
+            elif entity.data[d["name"]] != 0:
+                data.append({"name": d["name"], "value": entity.data[d["name"]]})
+        entity = {"archetype": e["archetype"], "data": data}
+        if e.get("name") in names:
+            entity["name"] = names[e["name"]]
+        compacted.append(entity)
+    return compacted
+
+
+def verify_compact(original: list[dict], compacted: list[dict]):
+    # Refs are resolved to entity indexes by parsing, so renamed entities compare equal. Beats are checked by
+    # the time they play at, since that is what quantizing must not change.
+    old_entities = parse_entities(original)
+    new_entities = parse_entities(compacted)
+    old_timeline = bpm_timeline(old_entities)
+    new_timeline = bpm_timeline(new_entities)
+    beats = []
+    for i, (a, b) in enumerate(zip(old_entities, new_entities, strict=True)):
+        if a.archetype != b.archetype:
+            raise ValueError(f"Entity {i} changed archetype from {a.archetype} to {b.archetype}")
+        for name in a.data.keys() | b.data.keys():
+            old = a.data.get(name, 0)
+            new = b.data.get(name, 0)
+            if is_beat_field(name):
+                beats.append((old, new))
+                old_time = old_timeline.beat_to_time(old)
+                new_time = new_timeline.beat_to_time(new)
+                if abs(old_time - new_time) > TIME_TOLERANCE:
+                    raise ValueError(f"Entity {i} field {name} moved from {old_time}s to {new_time}s")
+            elif name == TARGET_TIME_FIELD:
+                if abs(old - new) > TIME_TOLERANCE:
+                    raise ValueError(f"Entity {i} field {name} moved from {old}s to {new}s")
+                if new and abs(new - new_timeline.beat_to_time(b.data.get("beat", 0))) > TIME_TOLERANCE:
+                    raise ValueError(f"Entity {i} field {name} no longer matches its beat")
+            elif old != new:
+                raise ValueError(f"Entity {i} field {name} changed from {old} to {new}")
+    # Sim and prev links are explicit refs, so beats may merge onto one tick but must never swap order.
+    beats.sort()
+    for (old_a, new_a), (old_b, new_b) in pairwise(beats):
+        if new_a > new_b:
+            raise ValueError(f"Beats {old_a} and {old_b} swapped order after quantizing")
+
+
+def compact_level_data(data: dict, ticks_per_beat: int | None = TICKS_PER_BEAT) -> dict:
+    compacted = {**data, "entities": compact_entities(data["entities"], ticks_per_beat)}
+    verify_compact(data["entities"], compacted["entities"])
+    return compacted
+
+
+def update_item_hash(level_dir: Path, data: bytes):
+    item_path = level_dir / "item.json"
+    if not item_path.exists():
+        return
+    item = json.loads(item_path.read_text(encoding="utf-8"))
+    if isinstance(item.get("data"), dict) and "hash" in item["data"]:
+        item["data"]["hash"] = hashlib.sha1(data).hexdigest()
+        item_path.write_text(json.dumps(item, ensure_ascii=False), encoding="utf-8")
+
+
+def compact_level_dir(level_dir: Path, ticks_per_beat: int | None = TICKS_PER_BEAT) -> CompactResult:
+    path = level_dir / "data"
+    original = path.read_bytes()
+    data = json.loads(gzip.decompress(original).decode("utf-8"))
+    try:
+        compacted = compact_level_data(data, ticks_per_beat)
+    except ValueError as e:
+        # Charts with timing finer than the grid still get the lossless part of the compaction.
+        print(f"Not quantizing {level_dir.name}: {e}")
+        ticks_per_beat = None
+        compacted = compact_level_data(data, None)
+    output = gzip.compress(json.dumps(compacted, separators=(",", ":")).encode("utf-8"), mtime=0)
+    if len(output) >= len(original):
+        return CompactResult(len(original), len(original), None)
+    path.write_bytes(output)
+    update_item_hash(level_dir, output)
+    return CompactResult(len(original), len(output), ticks_per_beat)
+
+
+def compact_export_dir(levels_dir: Path, ticks_per_beat: int | None = TICKS_PER_BEAT) -> CompactResult:
+    original_size = 0
+    compact_size = 0
+    for level_dir in sorted(levels_dir.iterdir()):
+        if not (level_dir / "data").exists():
+            continue
+        result = compact_level_dir(level_dir, ticks_per_beat)
+        original_size += result.original_size
+        compact_size += result.compact_size
+    if original_size > 0:
+        print(
+            f"Compacted level data from {original_size} to {compact_size} bytes gzipped "
+            f"({100 * (1 - compact_size / original_size):.1f}% smaller)"
+        )
+    return CompactResult(original_size, compact_size, ticks_per_beat)
+
+
+def main():
+    levels_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("downloads") / "levels"
+    ticks_per_beat = int(sys.argv[2]) if len(sys.argv) > 2 else TICKS_PER_BEAT
+    compact_export_dir(levels_dir, ticks_per_beat or None)
+
+
+if __name__ == "__main__":
+    main()
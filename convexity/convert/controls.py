@@ -0,0 +1,25 @@
+from collections.abc import Sequence
+
+from sonolus.script.array import Array
+
+from convexity.common.note import CONTROL_POINT_COUNT, ControlPoint
+
+
+def fold_anchor_runs(hidden: Sequence[bool], max_controls: int = CONTROL_POINT_COUNT) -> dict[int, list[int]]:
+    # Maps chain indexes to the hidden anchors right before them, which they carry as control points instead.
+    # Anchors past what one note can carry stay as entities and carry the run before them, and the chain's
+    # first and last points are always kept.
+    controls = {}
+    run = []
+    for i in range(1, len(hidden)):
+        if hidden[i] and len(run) < max_controls and i < len(hidden) - 1:
+            run.append(i)
+        elif run:
+            controls[i] = run
+            run = []
+    return controls
+
+
+def control_point_array(points: Sequence[tuple[float, float]]) -> Array[ControlPoint, CONTROL_POINT_COUNT]:
+    padded = [*points, *[(0, 0)] * (CONTROL_POINT_COUNT - len(points))]
+    return Array(*(ControlPoint(beat=beat, lane=lane) for beat, lane in padded))
@@ -0,0 +1,153 @@
+from array import array
+
+from sonolus.script.level import LevelData
+
+from convexity.common.note import NoteVariant
+from convexity.convert.controls import control_point_array, fold_anchor_runs
+from convexity.convert.sim import SIM_SNAP_DISTANCE, sim_pairs
+from convexity.convert.timescale import TimescaleGroups
+from convexity.convert.timing import fill_note_times, spawn_sorted_entities
+from convexity.play.bpm import BpmChange
+from convexity.play.init import Init
+from convexity.play.lane import Lane
+from convexity.play.note import Note, UnscoredNote
+from convexity.play.stage import Stage
+from convexity.play.timescale import TimescaleChange, TimescaleGroup
+
+
+class NoteTable:
+    # Notes are kept as parallel arrays and only turned into archetype instances once everything is linked.
+    def __init__(self):
+        self.beats = array("d")
+        self.lanes = array("d")
+        self.directions = array("d")
+        self.variants = array("b")
+        self.scored = array("b")
+        self.prevs = array("q")
+        self.sims = array("q")
+        self.by_source_index: dict[int, int] = {}
+        self.controls: dict[int, list[int]] = {}
+        self.folded: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.beats)
+
+    def add(
+        self,
+        variant: NoteVariant,
+        beat: float,
+        lane: float,
+        direction: float = 0,
+        *,
+        scored: bool = True,
+        source_index: int | None = None,
+    ) -> int:
+        i = len(self)
+        self.beats.append(beat)
+        self.lanes.append(lane)
+        self.directions.append(direction)
+        self.variants.append(variant)
+        self.scored.append(scored)
+        self.prevs.append(-1)
+        self.sims.append(-1)
+        if source_index is not None:
+            self.by_source_index[source_index] = i
+        return i
+
+    def link_sources(self, head_source_index: int, tail_source_index: int):
+        self.prevs[self.by_source_index[tail_source_index]] = self.by_source_index[head_source_index]
+
+    def beat_order(self) -> list[int]:
+        return sorted(range(len(self)), key=self.beats.__getitem__)
+
+    def link_sims(self, snap_distance: float = SIM_SNAP_DISTANCE):
+        beats, pairs = sim_pairs(
+            self.beats,
+            self.lanes,
+            [variant != NoteVariant.HOLD_ANCHOR for variant in self.variants],
+            snap_distance,
+        )
+        self.beats = array("d", beats)
+        for a, b in pairs:
+            self.sims[a] = b
+
+    def fold_anchors(self):
+        # Hidden anchors become control points of the next note in their chain, which is relinked past them.
+        nexts = {prev: i for i, prev in enumerate(self.prevs) if prev >= 0}
+        for head in range(len(self)):
+            if self.prevs[head] >= 0 or head not in nexts:
+                continue
+            chain = [head]
+            while chain[-1] in nexts:
+                chain.append(nexts[chain[-1]])
+            runs = fold_anchor_runs([self.variants[i] == NoteVariant.HOLD_ANCHOR for i in chain])
+            for carrier, run in runs.items():
+                self.controls[chain[carrier]] = [chain[j] for j in run]
+                self.prevs[chain[carrier]] = chain[run[0] - 1]
+                self.folded.update(chain[j] for j in run)
+
+    def materialize(self, timescale_group: TimescaleGroup) -> list[Note]:
+        notes = {}
+        for i in range(len(self)):
+            if i in self.folded:
+                continue
+            controls = self.controls.get(i, [])
+            notes[i] = (Note if self.scored[i] else UnscoredNote)(
+                variant=self.variants[i],
+                beat=self.beats[i],
+                lane=self.lanes[i],
+                direction=self.directions[i],
+                timescale_group_ref=timescale_group.ref(),
+                control_points=control_point_array([(self.beats[j], self.lanes[j]) for j in controls]),
+                control_count=len(controls),
+            )
+        for i, note in notes.items():
+            if self.prevs[i] >= 0:
+                note.prev_note_ref @= notes[self.prevs[i]].ref()
+            if self.sims[i] >= 0:
+                note.sim_note_ref @= notes[self.sims[i]].ref()
+        return [notes[i] for i in self.beat_order() if i in notes]
+
+
+def stage_entities(lane_count: int) -> list[Stage | Lane]:
+    return [
+        Stage(
+            lane=0,
+            width=lane_count,
+        ),
+        *(
+            Lane(
+                lane=i - (lane_count - 1) / 2,
+            )
+            for i in range(lane_count)
+        ),
+    ]
+
+
+def build_level_data(
+    table: NoteTable,
+    *,
+    bgm_offset: float,
+    base_leniency: float,
+    lane_count: int,
+    bpm_changes: list[BpmChange],
+    timescale_changes: list[TimescaleChange],
+    timescale_tolerance: float = 0,
+) -> LevelData:
+    timescale_groups = TimescaleGroups(timescale_tolerance)
+    notes = table.materialize(timescale_groups.add(timescale_changes))
+    fill_note_times(notes, bpm_changes)
+    return LevelData(
+        bgm_offset=bgm_offset,
+        entities=spawn_sorted_entities(
+            [
+                Init(
+                    base_leniency=base_leniency,
+                ),
+                *timescale_groups.entities(),
+                *stage_entities(lane_count),
+                *bpm_changes,
+                *notes,
+            ]
+        ),
+    )
@@ -1,4 +1,3 @@
-import itertools
 import tempfile
 import zipfile
 from collections import deque
@@ -9,12 +8,16 @@ from typing import NamedTuple
 
 from sonolus.script.level import Level, LevelData
 
+from convexity.convert.budget import DEFAULT_BUDGET, Budget, enforce_budget
+from convexity.convert.sim import link_sim_notes
+from convexity.convert.timescale import TimescaleGroups
+from convexity.convert.timing import fill_note_times, spawn_sorted_entities
 from convexity.play.bpm import BpmChange
 from convexity.play.init import Init
 from convexity.play.lane import Lane
 from convexity.play.note import Note, NoteVariant
 from convexity.play.stage import Stage
-from convexity.play.timescale import TimescaleChange, TimescaleGroup
+from convexity.play.timescale import TimescaleChange
 
 
 class TimingPoint(NamedTuple):
@@ -64,7 +67,12 @@ def convert_osz(osz: bytes) -> list[Level]:
     return levels
 
 
-def convert_osu(data: str, assets: Path) -> Level | None:
+def convert_osu(
+    data: str,
+    assets: Path,
+    budget: Budget | None = DEFAULT_BUDGET,
+    timescale_tolerance: float = 0,
+) -> Level | None:
     lines = deque(data.splitlines())
     parse_header(lines)
     sections = parse_sections(lines)
@@ -103,7 +111,6 @@ def convert_osu(data: str, assets: Path) -> Level | None:
         BpmChange(beat=0, bpm=60, meter=0),
     ]
     bpm_changes_by_time = [(0, 60, 0)]
-    timescale_group = TimescaleGroup()
     timescale_changes = [
         TimescaleChange(beat=0, scale=1),
     ]
@@ -128,6 +135,9 @@ def convert_osu(data: str, assets: Path) -> Level | None:
                 )
             )
     bpm_changes_by_time.append((1e8, 60, 0))
+    # osu!mania scroll speed changes apply to every column, so there is only ever one group.
+    timescale_groups = TimescaleGroups(timescale_tolerance)
+    timescale_group = timescale_groups.add(timescale_changes)
 
     notes = []
     bpm_change_index = 0
@@ -144,6 +154,7 @@ def convert_osu(data: str, assets: Path) -> Level | None:
                     variant=NoteVariant.SINGLE,
                     beat=section_beat + (hit_object.time - bpm_time) / 60000 * bpm,
                     lane=x_to_lane(hit_object.x),
+                    target_time=hit_object.time / 1000,
                     timescale_group_ref=timescale_group.ref(),
                 )
             )
@@ -152,49 +163,49 @@ def convert_osu(data: str, assets: Path) -> Level | None:
                 variant=NoteVariant.HOLD_START,
                 beat=section_beat + (hit_object.time - bpm_time) / 60000 * bpm,
                 lane=x_to_lane(hit_object.x),
+                target_time=hit_object.time / 1000,
                 timescale_group_ref=timescale_group.ref(),
             )
             end = Note(
                 variant=NoteVariant.HOLD_END,
                 beat=section_beat + (hit_object.slide_end_time - bpm_time) / 60000 * bpm,
                 lane=x_to_lane(hit_object.x),
+                target_time=hit_object.slide_end_time / 1000,
                 timescale_group_ref=timescale_group.ref(),
                 prev_note_ref=start.ref(),
             )
             notes.append(start)
             notes.append(end)
-        notes = sorted(notes, key=lambda note: note.beat)
 
-    notes_by_beat: dict[float, list[Note]] = {}
-    for note in notes:
-        notes_by_beat.setdefault(note.beat, []).append(note)
-    for group in notes_by_beat.values():
-        group.sort(key=lambda note: note.lane)
-        for a, b in itertools.pairwise(group):
-            a.sim_note_ref @= b.ref()
+    link_sim_notes(notes)
+    fill_note_times(notes, bpm_changes)
 
-    return Level(
-        name=f"convexity_{metadata["BeatmapSetID"]}_{metadata["BeatmapID"]}",
-        title=f"{metadata["TitleUnicode"]} - {metadata["Version"]}",
-        rating=0,
-        artists=metadata["ArtistUnicode"],
-        author=metadata["Creator"],
-        bgm=(assets / audio_filename).read_bytes(),
-        data=LevelData(
-            bgm_offset=0,
-            entities=[
+    level_data = LevelData(
+        bgm_offset=0,
+        entities=spawn_sorted_entities(
+            [
                 Init(
                     base_leniency=1,
                 ),
-                timescale_group,
-                *timescale_changes,
+                *timescale_groups.entities(),
                 *stages,
                 *lanes,
                 *bpm_changes,
                 *notes,
-            ],
+            ]
         ),
     )
+    enforce_budget(level_data, budget)
+
+    return Level(
+        name=f"convexity_{metadata["BeatmapSetID"]}_{metadata["BeatmapID"]}",
+        title=f"{metadata["TitleUnicode"]} - {metadata["Version"]}",
+        rating=0,
+        artists=metadata["ArtistUnicode"],
+        author=metadata["Creator"],
+        bgm=(assets / audio_filename).read_bytes(),
+        data=level_data,
+    )
 
 
 def parse_header(lines: deque):
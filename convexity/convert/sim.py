@@ -0,0 +1,46 @@
+from collections.abc import Sequence
+from itertools import pairwise
+
+from convexity.common.note import NoteVariant
+from convexity.play.note import Note
+
+# Beats closer than this are float noise from the source format and count as the same beat.
+SIM_SNAP_DISTANCE = 0.002
+
+
+def snap_beats(beats: Sequence[float], order: list[int], snap_distance: float = SIM_SNAP_DISTANCE) -> list[float]:
+    snapped = list(beats)
+    for a, b in pairwise(order):
+        if snapped[a] != snapped[b] and abs(snapped[a] - snapped[b]) < snap_distance:
+            snapped[b] = snapped[a]
+    return snapped
+
+
+def sim_pairs(
+    beats: Sequence[float],
+    lanes: Sequence[float],
+    linkable: Sequence[bool] | None = None,
+    snap_distance: float = SIM_SNAP_DISTANCE,
+) -> tuple[list[float], list[tuple[int, int]]]:
+    # Returns the snapped beats and (a, b) index pairs where a gets a sim line to b, left to right.
+    # A single sort on (beat, lane) replaces grouping by beat and sorting each group by lane.
+    snapped = snap_beats(beats, sorted(range(len(beats)), key=beats.__getitem__), snap_distance)
+    order = sorted(
+        (i for i in range(len(beats)) if linkable is None or linkable[i]),
+        key=lambda i: (snapped[i], lanes[i], beats[i]),
+    )
+    return snapped, [(a, b) for a, b in pairwise(order) if snapped[a] == snapped[b]]
+
+
+def link_sim_notes(notes: list[Note]):
+    beats, pairs = sim_pairs(
+        [note.beat for note in notes],
+        [note.lane for note in notes],
+        [note.variant != NoteVariant.HOLD_ANCHOR for note in notes],
+    )
+    for note, beat in zip(notes, beats, strict=True):
+        if note.beat != beat:
+            note.beat = beat
+            note.target_time = 0
+    for a, b in pairs:
+        notes[a].sim_note_ref @= notes[b].ref()
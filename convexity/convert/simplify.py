@@ -0,0 +1,32 @@
+from itertools import pairwise
+
+
+def lane_error(start: tuple[float, float], end: tuple[float, float], point: tuple[float, float]) -> float:
+    start_beat, start_lane = start
+    end_beat, end_lane = end
+    beat, lane = point
+    if end_beat == start_beat:
+        return max(abs(lane - start_lane), abs(lane - end_lane))
+    progress = (beat - start_beat) / (end_beat - start_beat)
+    return abs(lane - (start_lane + (end_lane - start_lane) * progress))
+
+
+def simplify_chain(points: list[tuple[float, float]], removable: list[bool], tolerance: float) -> list[int]:
+    # Ramer-Douglas-Peucker over (beat, lane), measuring the lane error at each point's beat since that is
+    # what a connector drawn straight between the kept points would be off by on screen.
+    # Points that aren't removable are always kept and split the chain into independent spans.
+    keep = [not r for r in removable]
+    if points:
+        keep[0] = keep[-1] = True
+    fixed = [i for i, k in enumerate(keep) if k]
+    stack = list(pairwise(fixed))
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        error, i = max((lane_error(points[lo], points[hi], points[i]), i) for i in range(lo + 1, hi))
+        if error > tolerance:
+            keep[i] = True
+            stack.append((lo, i))
+            stack.append((i, hi))
+    return [i for i, k in enumerate(keep) if k]
@@ -1,15 +1,12 @@
-import itertools
-
 from sonolus.script.level import LevelData
 
 from convexity.common.note import NoteVariant
-from convexity.convert.utils import convert_sonolus_level_item, get_sonolus_level_item, parse_entities
+from convexity.convert.budget import DEFAULT_BUDGET, Budget, enforce_budget
+from convexity.convert.note_table import NoteTable, build_level_data
+from convexity.convert.simplify import simplify_chain
+from convexity.convert.utils import EntityData, convert_sonolus_level_item, get_sonolus_level_item, parse_entities
 from convexity.play.bpm import BpmChange
-from convexity.play.init import Init
-from convexity.play.lane import Lane
-from convexity.play.note import Note, UnscoredNote
-from convexity.play.stage import Stage
-from convexity.play.timescale import TimescaleChange, TimescaleGroup
+from convexity.play.timescale import TimescaleChange
 
 
 def convert_sonolus_bandori_level(name: str, base_url: str = "https://sonolus.bestdori.com/official/") -> LevelData:
@@ -17,35 +14,23 @@ def convert_sonolus_bandori_level(name: str, base_url: str = "https://sonolus.be
     return convert_sonolus_level_item(item, base_url, "Bandori", convert_sonolus_bandori_level_data)
 
 
-def convert_sonolus_bandori_level_data(data: dict) -> LevelData:
+def convert_sonolus_bandori_level_data(
+    data: dict,
+    budget: Budget | None = DEFAULT_BUDGET,
+    anchor_tolerance: float | None = None,
+) -> LevelData:
     bgm_offset = data["bgmOffset"]
     entities = parse_entities(data["entities"])
+    prev_indexes = slide_prev_indexes(entities)
+    removed_anchor_indexes = set()
+    if anchor_tolerance is not None:
+        removed_anchor_indexes = simplified_anchor_indexes(entities, prev_indexes, anchor_tolerance)
 
-    lane_count = 7
-
-    stages = [
-        Stage(
-            lane=0,
-            width=lane_count,
-        )
-    ]
-    lanes = [
-        Lane(
-            lane=i - (lane_count - 1) / 2,
-        )
-        for i in range(lane_count)
-    ]
-    notes = []
-    notes_by_index = {}
     bpm_changes = []
-    timescale_group = TimescaleGroup()
-    timescale_changes = [
-        TimescaleChange(
-            beat=0,
-            scale=1,
-        )
-    ]
+    table = NoteTable()
     for i, (archetype, d) in enumerate(entities):
+        if i in removed_anchor_indexes:
+            continue
         match archetype:
             case "#BPM_CHANGE":
                 bpm_changes.append(
@@ -56,104 +41,79 @@ def convert_sonolus_bandori_level_data(data: dict) -> LevelData:
                     )
                 )
             case "TapNote":
-                note = Note(
-                    variant=NoteVariant.SINGLE,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.SINGLE, d["#BEAT"], d["lane"], source_index=i)
             case "FlickNote" | "SlideEndFlickNote":
-                note = Note(
-                    variant=NoteVariant.FLICK,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.FLICK, d["#BEAT"], d["lane"], source_index=i)
             case "DirectionalFlickNote":
-                note = Note(
-                    variant=NoteVariant.DIRECTIONAL_FLICK,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    direction=d["direction"] * d["size"],
-                    timescale_group_ref=timescale_group.ref(),
+                table.add(
+                    NoteVariant.DIRECTIONAL_FLICK,
+                    d["#BEAT"],
+                    d["lane"],
+                    d["direction"] * d["size"],
+                    source_index=i,
                 )
-                notes.append(note)
-                notes_by_index[i] = note
             case "SlideStartNote":
-                note = Note(
-                    variant=NoteVariant.HOLD_START,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_START, d["#BEAT"], d["lane"], source_index=i)
             case "SlideEndNote":
-                note = Note(
-                    variant=NoteVariant.HOLD_END,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_END, d["#BEAT"], d["lane"], source_index=i)
             case "SlideTickNote":
-                note = Note(
-                    variant=NoteVariant.HOLD_TICK,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_TICK, d["#BEAT"], d["lane"], source_index=i)
             case "IgnoredNote":
-                note = UnscoredNote(
-                    variant=NoteVariant.HOLD_ANCHOR,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_ANCHOR, d["#BEAT"], d["lane"], scored=False, source_index=i)
             case "CurvedSlideConnector" | "StraightSlideConnector" | "Stage" | "Initialization" | "SimLine":
                 pass
             case _:
                 raise ValueError(f"Unknown archetype: {archetype}")
 
-    for archetype, d in entities:
-        match archetype:
-            case "CurvedSlideConnector" | "StraightSlideConnector":
-                head = notes_by_index[d["head"]]
-                tail = notes_by_index[d["tail"]]
-                tail.prev_note_ref @= head.ref()
+    for tail_index, head_index in prev_indexes.items():
+        if tail_index in removed_anchor_indexes:
+            continue
+        while head_index in removed_anchor_indexes:
+            head_index = prev_indexes[head_index]
+        table.link_sources(head_index, tail_index)
 
-    notes.sort(key=lambda note: note.beat)
-    for a, b in itertools.pairwise(notes):
-        if a.beat != b.beat and abs(a.beat - b.beat) < 0.002:
-            b.beat = a.beat
-    notes_by_beat: dict[float, list[Note]] = {}
-    for note in notes:
-        notes_by_beat.setdefault(note.beat, []).append(note)
-    for group in notes_by_beat.values():
-        group.sort(key=lambda note: note.lane)
-        for a, b in itertools.pairwise(n for n in group if n.variant != NoteVariant.HOLD_ANCHOR):
-            a.sim_note_ref @= b.ref()
+    table.fold_anchors()
+    table.link_sims()
 
-    return LevelData(
+    level_data = build_level_data(
+        table,
         bgm_offset=bgm_offset,
-        entities=[
-            Init(
-                base_leniency=2.35,
-            ),
-            timescale_group,
-            *timescale_changes,
-            *stages,
-            *lanes,
-            *bpm_changes,
-            *notes,
+        base_leniency=2.35,
+        lane_count=7,
+        bpm_changes=bpm_changes,
+        timescale_changes=[
+            TimescaleChange(
+                beat=0,
+                scale=1,
+            )
         ],
     )
+    if anchor_tolerance is not None:
+        print(f"Removed {len(removed_anchor_indexes)} hidden anchors, {len(level_data.entities)} entities remaining")
+    enforce_budget(level_data, budget)
+    return level_data
+
+
+def slide_prev_indexes(entities: list[EntityData]) -> dict[int, int]:
+    return {
+        d["tail"]: d["head"]
+        for archetype, d in entities
+        if archetype in {"CurvedSlideConnector", "StraightSlideConnector"}
+    }
+
+
+def simplified_anchor_indexes(entities: list[EntityData], prev_indexes: dict[int, int], tolerance: float) -> set[int]:
+    next_indexes = {head: tail for tail, head in prev_indexes.items()}
+    removed = set()
+    for head in next_indexes.keys() - prev_indexes.keys():
+        chain = [head]
+        while chain[-1] in next_indexes:
+            chain.append(next_indexes[chain[-1]])
+        kept = simplify_chain(
+            [(entities[i].data["#BEAT"], entities[i].data["lane"]) for i in chain],
+            [entities[i].archetype == "IgnoredNote" for i in chain],
+            tolerance,
+        )
+        removed.update(chain)
+        removed.difference_update(chain[i] for i in kept)
+    return removed
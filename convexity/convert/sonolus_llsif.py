@@ -1,19 +1,15 @@
-import itertools
-
 from sonolus.script.level import Level, LevelData
 
 from convexity.common.note import NoteVariant
+from convexity.convert.budget import DEFAULT_BUDGET, Budget, enforce_budget
+from convexity.convert.note_table import NoteTable, build_level_data
 from convexity.convert.utils import (
     convert_sonolus_level_item,
     get_sonolus_level_item,
     parse_entities,
 )
 from convexity.play.bpm import BpmChange
-from convexity.play.init import Init
-from convexity.play.lane import Lane
-from convexity.play.note import Note
-from convexity.play.stage import Stage
-from convexity.play.timescale import TimescaleChange, TimescaleGroup
+from convexity.play.timescale import TimescaleChange
 
 
 def convert_sonolus_llsif_level(name: str, base_url: str = "https://sonolus.milkbun.org/llsif/") -> Level:
@@ -21,34 +17,22 @@ def convert_sonolus_llsif_level(name: str, base_url: str = "https://sonolus.milk
     return convert_sonolus_level_item(item, base_url, "LLSIF", convert_sonolus_llsif_level_data)
 
 
-def convert_sonolus_llsif_level_data(data: dict) -> LevelData:
+def convert_sonolus_llsif_level_data(
+    data: dict,
+    budget: Budget | None = DEFAULT_BUDGET,
+    timescale_tolerance: float = 0,
+) -> LevelData:
     bgm_offset = data["bgmOffset"]
     entities = parse_entities(data["entities"])
 
-    lane_count = 9
-
-    stages = [
-        Stage(
-            lane=0,
-            width=lane_count,
-        )
-    ]
-    lanes = [
-        Lane(
-            lane=i - (lane_count - 1) / 2,
-        )
-        for i in range(lane_count)
-    ]
-    notes = []
-    notes_by_index = {}
     bpm_changes = []
-    timescale_group = TimescaleGroup()
     timescale_changes = [
         TimescaleChange(
             beat=0,
             scale=1,
         )
     ]
+    table = NoteTable()
     for i, (archetype, d) in enumerate(entities):
         match archetype:
             case "#BPM_CHANGE":
@@ -60,35 +44,18 @@ def convert_sonolus_llsif_level_data(data: dict) -> LevelData:
                     )
                 )
             case "TapNote":
-                note = Note(
-                    variant=NoteVariant.SINGLE if not d.get("hold") else NoteVariant.HOLD_START,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
+                table.add(
+                    NoteVariant.SINGLE if not d.get("hold") else NoteVariant.HOLD_START,
+                    d["#BEAT"],
+                    d["lane"],
+                    source_index=i,
                 )
-                notes.append(note)
-                notes_by_index[i] = note
             case "HoldNote":
-                prev = notes_by_index[int(d["prev"])]
-                note = Note(
-                    variant=NoteVariant.HOLD_END,
-                    beat=d["#BEAT"],
-                    lane=prev.lane,
-                    timescale_group_ref=timescale_group.ref(),
-                    prev_note_ref=prev.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                prev = table.by_source_index[int(d["prev"])]
+                note = table.add(NoteVariant.HOLD_END, d["#BEAT"], table.lanes[prev], source_index=i)
+                table.prevs[note] = prev
             case "SwingNote":
-                note = Note(
-                    variant=NoteVariant.SWING,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                    direction=d["direction"],
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.SWING, d["#BEAT"], d["lane"], d["direction"], source_index=i)
             case "TimescaleChange":
                 timescale_changes.append(
                     TimescaleChange(
@@ -97,29 +64,16 @@ def convert_sonolus_llsif_level_data(data: dict) -> LevelData:
                     )
                 )
 
-    notes.sort(key=lambda note: note.beat)
-    for a, b in itertools.pairwise(notes):
-        if a.beat != b.beat and abs(a.beat - b.beat) < 0.002:
-            b.beat = a.beat
-    notes_by_beat: dict[float, list[Note]] = {}
-    for note in notes:
-        notes_by_beat.setdefault(note.beat, []).append(note)
-    for group in notes_by_beat.values():
-        group.sort(key=lambda note: note.lane)
-        for a, b in itertools.pairwise(n for n in group if n.variant != NoteVariant.HOLD_ANCHOR):
-            a.sim_note_ref @= b.ref()
+    table.link_sims()
 
-    return LevelData(
+    level_data = build_level_data(
+        table,
         bgm_offset=bgm_offset,
-        entities=[
-            Init(
-                base_leniency=1,
-            ),
-            timescale_group,
-            *timescale_changes,
-            *stages,
-            *lanes,
-            *bpm_changes,
-            *notes,
-        ],
+        base_leniency=1,
+        lane_count=9,
+        bpm_changes=bpm_changes,
+        timescale_changes=timescale_changes,
+        timescale_tolerance=timescale_tolerance,
     )
+    enforce_budget(level_data, budget)
+    return level_data
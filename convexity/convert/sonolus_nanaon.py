@@ -1,15 +1,11 @@
-import itertools
-
 from sonolus.script.level import LevelData
 
 from convexity.common.note import NoteVariant
+from convexity.convert.budget import DEFAULT_BUDGET, Budget, enforce_budget
+from convexity.convert.note_table import NoteTable, build_level_data
 from convexity.convert.utils import convert_sonolus_level_item, get_sonolus_level_item, parse_entities
 from convexity.play.bpm import BpmChange
-from convexity.play.init import Init
-from convexity.play.lane import Lane
-from convexity.play.note import Note
-from convexity.play.stage import Stage
-from convexity.play.timescale import TimescaleChange, TimescaleGroup
+from convexity.play.timescale import TimescaleChange
 
 
 def convert_sonolus_nanaon_level(name: str, base_url: str = "https://sonolus.milkbun.org/nanaon/") -> LevelData:
@@ -17,34 +13,12 @@ def convert_sonolus_nanaon_level(name: str, base_url: str = "https://sonolus.mil
     return convert_sonolus_level_item(item, base_url, "Nanaon", convert_sonolus_nanaon_level_data)
 
 
-def convert_sonolus_nanaon_level_data(data: dict) -> LevelData:
+def convert_sonolus_nanaon_level_data(data: dict, budget: Budget | None = DEFAULT_BUDGET) -> LevelData:
     bgm_offset = data["bgmOffset"]
     entities = parse_entities(data["entities"])
 
-    lane_count = 5
-
-    stages = [
-        Stage(
-            lane=0,
-            width=lane_count,
-        )
-    ]
-    lanes = [
-        Lane(
-            lane=i - (lane_count - 1) / 2,
-        )
-        for i in range(lane_count)
-    ]
-    notes = []
-    notes_by_index = {}
     bpm_changes = []
-    timescale_group = TimescaleGroup()
-    timescale_changes = [
-        TimescaleChange(
-            beat=0,
-            scale=1,
-        )
-    ]
+    table = NoteTable()
     for i, (archetype, d) in enumerate(entities):
         match archetype:
             case "#BPM_CHANGE":
@@ -56,50 +30,15 @@ def convert_sonolus_nanaon_level_data(data: dict) -> LevelData:
                     )
                 )
             case "TapNote":
-                note = Note(
-                    variant=NoteVariant.SINGLE,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.SINGLE, d["#BEAT"], d["lane"], source_index=i)
             case "FlickNote" | "SlideEndFlickNote":
-                note = Note(
-                    variant=NoteVariant.FLICK,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.FLICK, d["#BEAT"], d["lane"], source_index=i)
             case "SlideStartNote":
-                note = Note(
-                    variant=NoteVariant.HOLD_START,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_START, d["#BEAT"], d["lane"], source_index=i)
             case "SlideEndNote":
-                note = Note(
-                    variant=NoteVariant.HOLD_END,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_END, d["#BEAT"], d["lane"], source_index=i)
             case "SlideTickNote":
-                note = Note(
-                    variant=NoteVariant.HOLD_TICK,
-                    beat=d["#BEAT"],
-                    lane=d["lane"],
-                    timescale_group_ref=timescale_group.ref(),
-                )
-                notes.append(note)
-                notes_by_index[i] = note
+                table.add(NoteVariant.HOLD_TICK, d["#BEAT"], d["lane"], source_index=i)
             case "SlideConnector" | "Stage" | "Initialization" | "SimLine":
                 pass
             case _:
@@ -108,33 +47,22 @@ def convert_sonolus_nanaon_level_data(data: dict) -> LevelData:
     for archetype, d in entities:
         match archetype:
             case "SlideConnector":
-                head = notes_by_index[d["head"]]
-                tail = notes_by_index[d["tail"]]
-                tail.prev_note_ref @= head.ref()
+                table.link_sources(d["head"], d["tail"])
 
-    notes.sort(key=lambda note: note.beat)
-    for a, b in itertools.pairwise(notes):
-        if a.beat != b.beat and abs(a.beat - b.beat) < 0.002:
-            b.beat = a.beat
-    notes_by_beat: dict[float, list[Note]] = {}
-    for note in notes:
-        notes_by_beat.setdefault(note.beat, []).append(note)
-    for group in notes_by_beat.values():
-        group.sort(key=lambda note: note.lane)
-        for a, b in itertools.pairwise(n for n in group if n.variant != NoteVariant.HOLD_ANCHOR):
-            a.sim_note_ref @= b.ref()
+    table.link_sims()
 
-    return LevelData(
+    level_data = build_level_data(
+        table,
         bgm_offset=bgm_offset,
-        entities=[
-            Init(
-                base_leniency=1.5,
-            ),
-            timescale_group,
-            *timescale_changes,
-            *stages,
-            *lanes,
-            *bpm_changes,
-            *notes,
+        base_leniency=1.5,
+        lane_count=5,
+        bpm_changes=bpm_changes,
+        timescale_changes=[
+            TimescaleChange(
+                beat=0,
+                scale=1,
+            )
         ],
     )
+    enforce_budget(level_data, budget)
+    return level_data
@@ -0,0 +1,32 @@
+from convexity.play.timescale import TimescaleChange, TimescaleGroup
+
+
+def compact_timescale_changes(changes: list[TimescaleChange], tolerance: float = 0) -> list[TimescaleChange]:
+    result = []
+    for change in sorted(changes, key=lambda change: change.beat):
+        if result and change.beat == result[-1].beat:
+            # A zero length segment has no effect, the later change at the same beat is the one that applies.
+            result.pop()
+        if result and abs(change.scale - result[-1].scale) <= tolerance:
+            # Compare against the kept change rather than the previous one so drift can't accumulate.
+            continue
+        result.append(change)
+    return result
+
+
+class TimescaleGroups:
+    def __init__(self, tolerance: float = 0):
+        self.tolerance = tolerance
+        self.groups: dict[tuple[tuple[float, float], ...], tuple[TimescaleGroup, list[TimescaleChange]]] = {}
+
+    def add(self, changes: list[TimescaleChange]) -> TimescaleGroup:
+        # Groups with the same compacted changes behave identically, so they share one group entity.
+        changes = compact_timescale_changes(changes, self.tolerance)
+        key = tuple((change.beat, change.scale) for change in changes)
+        if key not in self.groups:
+            self.groups[key] = (TimescaleGroup(), changes)
+        return self.groups[key][0]
+
+    def entities(self) -> list[TimescaleGroup | TimescaleChange]:
+        # The engine expects each group to be followed directly by its changes.
+        return [entity for group, changes in self.groups.values() for entity in (group, *changes)]
@@ -0,0 +1,150 @@
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import pairwise
+
+from convexity.play.bpm import BpmChange
+from convexity.play.note import Note
+from convexity.play.timescale import TimescaleChange, TimescaleGroup
+
+# Matches the engine's preempt time at the default note speed without extended lanes.
+DEFAULT_PREEMPT_TIME = 5 / 10
+
+# The engine's shortest preempt time, at the maximum note speed.
+MIN_PREEMPT_TIME = 5 / 20
+
+# The engine starts the first timescale section before the level begins so early notes can spawn.
+FIRST_SECTION_START_TIME = -10
+
+
+class Timeline:
+    def __init__(self, bpm_changes: list[tuple[float, float]], timescale_changes: list[tuple[float, float]]):
+        bpm_changes = sorted(bpm_changes) or [(0, 60)]
+        self.bpm_beats = [beat for beat, _ in bpm_changes]
+        self.bpms = [bpm for _, bpm in bpm_changes]
+        self.bpm_times = [0.0]
+        for (beat, bpm), (next_beat, _) in pairwise(bpm_changes):
+            self.bpm_times.append(self.bpm_times[-1] + (next_beat - beat) * 60 / bpm)
+
+        timescale_changes = sorted(timescale_changes) or [(0, 1)]
+        self.scales = [scale for _, scale in timescale_changes]
+        self.section_times = [
+            self.beat_to_time(beat) if beat > 0 else FIRST_SECTION_START_TIME for beat, _ in timescale_changes
+        ]
+        self.section_scaled_times = [0.0]
+        for (start, end), scale in zip(pairwise(self.section_times), self.scales, strict=False):
+            self.section_scaled_times.append(self.section_scaled_times[-1] + scale * (end - start))
+
+    def beat_to_time(self, beat: float) -> float:
+        i = max(0, bisect_right(self.bpm_beats, beat) - 1)
+        return self.bpm_times[i] + (beat - self.bpm_beats[i]) * 60 / self.bpms[i]
+
+    def time_to_beat(self, time: float) -> float:
+        i = max(0, bisect_right(self.bpm_times, time) - 1)
+        return self.bpm_beats[i] + (time - self.bpm_times[i]) * self.bpms[i] / 60
+
+    def time_to_scaled_time(self, time: float) -> float:
+        i = max(0, bisect_right(self.section_times, time) - 1)
+        return self.section_scaled_times[i] + (time - self.section_times[i]) * self.scales[i]
+
+    def scaled_time_to_time(self, scaled_time: float) -> float:
+        # Like the engine, use the first section that reaches the scaled time, since it need not be monotonic.
+        for i, scale in enumerate(self.scales):
+            start = self.section_scaled_times[i]
+            end = self.section_scaled_times[i + 1] if i + 1 < len(self.scales) else None
+            if end is None:
+                if scale != 0 and (scaled_time - start) / scale >= 0:
+                    return self.section_times[i] + (scaled_time - start) / scale
+                break
+            if min(start, end) <= scaled_time <= max(start, end) and start != end:
+                return self.section_times[i] + (scaled_time - start) / scale
+        return FIRST_SECTION_START_TIME
+
+    def spawn_time(self, target_time: float, preempt_time: float = DEFAULT_PREEMPT_TIME) -> float:
+        scaled_time = self.time_to_scaled_time(target_time)
+        return min(target_time, self.scaled_time_to_time(max(scaled_time - preempt_time, -10)))
+
+    def scale_segments(self, start_time: float, end_time: float) -> list[tuple[float, float]]:
+        segments = []
+        for i, scale in enumerate(self.scales):
+            section_start = max(self.section_times[i], start_time)
+            section_end = min(self.section_times[i + 1] if i + 1 < len(self.scales) else end_time, end_time)
+            if section_end > section_start:
+                segments.append((section_end - section_start, scale))
+        return segments
+
+
+def fill_note_times(notes: list[Note], bpm_changes: list[BpmChange], tolerance: float = 1e-3):
+    # Notes with an imported time skip the BPM lookup in the engine. Zero means the engine computes it itself.
+    timeline = Timeline([(change.beat, change.bpm) for change in bpm_changes], [])
+    for note in notes:
+        time = timeline.beat_to_time(note.beat)
+        if note.target_time == 0:
+            note.target_time = time
+        else:
+            assert abs(note.target_time - time) <= tolerance, f"Note at beat {note.beat} has time {note.target_time}"
+
+
+def spawn_sorted_entities(entities: list, preempt_time: float = MIN_PREEMPT_TIME) -> list:
+    # Emitting each chain together, in order of its earliest spawn time, lets preprocessing see prevs first
+    # and keeps the spawn queue close to index order. Other entities keep their order ahead of the notes.
+    bpm_changes = [(entity.beat, entity.bpm) for entity in entities if isinstance(entity, BpmChange)]
+    group_changes: dict[int, list[tuple[float, float]]] = {}
+    changes = []
+    for entity in entities:
+        if isinstance(entity, TimescaleGroup):
+            changes = group_changes.setdefault(id(entity), [])
+        elif isinstance(entity, TimescaleChange):
+            # The engine expects each group to be followed directly by its changes.
+            changes.append((entity.beat, entity.scale))
+    timelines = {group: Timeline(bpm_changes, changes) for group, changes in group_changes.items()}
+    default_timeline = Timeline(bpm_changes, [])
+
+    notes = [entity for entity in entities if isinstance(entity, Note)]
+    note_indexes = {id(note): i for i, note in enumerate(notes)}
+
+    def ref_index(ref) -> int:
+        return note_indexes.get(id(getattr(ref, "_ref_", None)), -1)
+
+    spawns = []
+    for note in notes:
+        timeline = timelines.get(id(getattr(note.timescale_group_ref, "_ref_", None)), default_timeline)
+        spawns.append(timeline.spawn_time(note.target_time or timeline.beat_to_time(note.beat), preempt_time))
+
+    nexts = defaultdict(list)
+    heads = []
+    for i, note in enumerate(notes):
+        prev = ref_index(note.prev_note_ref)
+        if prev >= 0:
+            nexts[prev].append(i)
+        else:
+            heads.append(i)
+
+    chains = []
+    chain_indexes = {}
+    for head in heads:
+        chain = []
+        stack = [head]
+        while stack:
+            i = stack.pop()
+            chain_indexes[i] = len(chains)
+            chain.append(i)
+            stack.extend(reversed(nexts[i]))
+        chains.append(chain)
+    keys = [min(spawns[i] for i in chain) for chain in chains]
+    sim_chains = []
+    for i, note in enumerate(notes):
+        j = ref_index(note.sim_note_ref)
+        if j >= 0:
+            sim_chains.append((chain_indexes[i], chain_indexes[j]))
+    # Sim partners spawn together, so a sim can pull the chain of its partner earlier.
+    changed = True
+    while changed:
+        changed = False
+        for a, b in sim_chains:
+            if keys[a] != keys[b]:
+                keys[a] = keys[b] = min(keys[a], keys[b])
+                changed = True
+    order = sorted(range(len(chains)), key=lambda c: (keys[c], notes[chains[c][0]].target_time, chains[c][0]))
+
+    others = [entity for entity in entities if not isinstance(entity, Note)]
+    return [*others, *(notes[i] for c in order for i in chains[c])]
@@ -13,7 +13,9 @@ from sonolus.script.vec import Vec2
 
 from convexity.common.init import init_buckets, init_life, init_score
 from convexity.common.layout import init_layout
+from convexity.common.note import init_note_kinds
 from convexity.common.options import Options
+from convexity.common.quality import init_quality
 from convexity.play.config import PlayConfig
 from convexity.play.input_manager import InputManager
 from convexity.play.note import Note
@@ -32,6 +34,8 @@ class Init(PlayArchetype):
         init_life(Note)
         init_ui()
         init_layout()
+        init_quality()
+        init_note_kinds()
 
         if Options.leniency == 0:
             PlayConfig.base_leniency = self.base_leniency
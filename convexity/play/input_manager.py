@@ -1,24 +1,83 @@
 from collections.abc import Iterable
 
 from sonolus.script.archetype import PlayArchetype, callback
+from sonolus.script.array import Array
 from sonolus.script.containers import VarArray
 from sonolus.script.globals import level_memory
 from sonolus.script.runtime import Touch, touches
 
+from convexity.common.debug import DebugCounter, debug_count, end_debug_frame
+from convexity.common.effect import reset_effect_budget
+from convexity.common.options import Options
+from convexity.common.quality import update_quality
+
+# Open addressing with linear probing, kept at most half full so probes stay short and always hit an empty slot.
+# Touches past what the table holds are rare, so they fall back to a scan and a separate used set.
+TOUCH_TABLE_SIZE = 64
+MAX_TABLE_TOUCHES = TOUCH_TABLE_SIZE // 2
+
 input_note_indexes = level_memory(VarArray[int, 16])
-used_touch_ids = level_memory(VarArray[int, 16])
+overflow_used_touch_ids = level_memory(VarArray[int, 16])
+
+
+@level_memory
+class TouchTable:
+    ids: Array[int, TOUCH_TABLE_SIZE]
+    indexes: Array[int, TOUCH_TABLE_SIZE]
+    used: Array[bool, TOUCH_TABLE_SIZE]
+
+
+def build_touch_table():
+    # Touch ids are never 0, so 0 marks an empty slot.
+    for slot in range(TOUCH_TABLE_SIZE):
+        TouchTable.ids[slot] = 0
+        TouchTable.used[slot] = False
+    overflow_used_touch_ids.clear()
+    for i in range(min(len(touches()), MAX_TABLE_TOUCHES)):
+        slot = touches()[i].id % TOUCH_TABLE_SIZE
+        while TouchTable.ids[slot] != 0:
+            slot = (slot + 1) % TOUCH_TABLE_SIZE
+        TouchTable.ids[slot] = touches()[i].id
+        TouchTable.indexes[slot] = i
+
+
+def touch_slot(touch_id: int) -> int:
+    slot = touch_id % TOUCH_TABLE_SIZE
+    while TouchTable.ids[slot] != 0:
+        if TouchTable.ids[slot] == touch_id:
+            return slot
+        slot = (slot + 1) % TOUCH_TABLE_SIZE
+    return -1
+
+
+def find_touch(touch_id: int) -> int:
+    # Returns the index of the touch in touches(), or -1 if there is no such touch this frame.
+    slot = touch_slot(touch_id)
+    if slot >= 0:
+        return TouchTable.indexes[slot]
+    for i in range(MAX_TABLE_TOUCHES, len(touches())):
+        if touches()[i].id == touch_id:
+            return i
+    return -1
 
 
 def touch_is_used(touch: Touch) -> bool:
-    return touch.id in used_touch_ids
+    slot = touch_slot(touch.id)
+    if slot >= 0:
+        return TouchTable.used[slot]
+    return touch.id in overflow_used_touch_ids
 
 
 def mark_touch_used(touch: Touch):
-    used_touch_ids.set_add(touch.id)
+    mark_touch_id_used(touch.id)
 
 
 def mark_touch_id_used(touch_id: int):
-    used_touch_ids.set_add(touch_id)
+    slot = touch_slot(touch_id)
+    if slot >= 0:
+        TouchTable.used[slot] = True
+    else:
+        overflow_used_touch_ids.set_add(touch_id)
 
 
 def unused_touches() -> Iterable[Touch]:
@@ -32,5 +91,13 @@ def taps() -> Iterable[Touch]:
 class InputManager(PlayArchetype):
     @callback(order=-1)
     def update_sequential(self):
+        if Options.debug_counters:
+            debug_count(DebugCounter.INPUT_NOTES, len(input_note_indexes))
+        end_debug_frame()
         input_note_indexes.clear()
-        used_touch_ids.clear()
+        update_quality()
+        reset_effect_budget()
+
+    @callback(order=-1)
+    def touch(self):
+        build_touch_table()
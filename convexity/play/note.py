@@ -11,15 +11,17 @@ from sonolus.script.archetype import (
     imported,
     shared_memory,
 )
+from sonolus.script.array import Array
 from sonolus.script.bucket import Bucket, Judgment, JudgmentWindow
 from sonolus.script.interval import Interval, lerp, unlerp
 from sonolus.script.particle import Particle
 from sonolus.script.runtime import input_offset, time, touches
 from sonolus.script.sprite import Sprite
 from sonolus.script.timing import beat_to_time
-from sonolus.script.values import copy
+from sonolus.script.values import copy, zeros
 from sonolus.script.vec import Vec2
 
+from convexity.common.debug import DebugCounter, debug_count
 from convexity.common.layout import (
     LanePosition,
     lane_hitbox,
@@ -28,7 +30,12 @@ from convexity.common.layout import (
     note_y,
 )
 from convexity.common.note import (
+    CONTROL_POINT_COUNT,
+    ControlPoint,
+    DrawCount,
     HoldHandle,
+    NoteFlag,
+    NoteKind,
     NoteVariant,
     draw_note_arrow,
     draw_note_body,
@@ -37,21 +44,27 @@ from convexity.common.note import (
     draw_note_sim_line,
     draw_swing_arrow,
     flick_velocity_threshold,
-    note_arrow_sprite,
-    note_body_sprite,
-    note_bucket,
-    note_connector_sprite,
-    note_head_sprite,
-    note_hold_particle,
-    note_particle,
-    note_window,
+    has_flag,
+    note_kind_index,
+    note_kinds,
     play_hit_effects,
     schedule_auto_hit_sfx,
+    set_flag,
+    span_on_stage,
     swing_velocity_threshold,
+    with_visibility,
+    y_on_stage,
 )
 from convexity.common.options import Options
 from convexity.play.config import PlayConfig
-from convexity.play.input_manager import input_note_indexes, mark_touch_id_used, mark_touch_used, taps, touch_is_used
+from convexity.play.input_manager import (
+    find_touch,
+    input_note_indexes,
+    mark_touch_id_used,
+    mark_touch_used,
+    taps,
+    touch_is_used,
+)
 from convexity.play.timescale import TimescaleGroup
 
 
@@ -63,35 +76,36 @@ class Note(PlayArchetype):
     lane: float = imported()
     leniency: float = imported()
     direction: float = imported()
+    target_time: float = imported()
     timescale_group_ref: EntityRef[TimescaleGroup] = imported()
     prev_note_ref: EntityRef[Note] = imported()
     sim_note_ref: EntityRef[Note] = imported()
+    control_points: Array[ControlPoint, CONTROL_POINT_COUNT] = imported()
+    control_count: int = imported()
 
     touch_id: int = shared_memory()
     y: float = shared_memory()
-    input_finished: bool = shared_memory()
-    finished: bool = shared_memory()
+    flags: int = shared_memory()
     base_hitbox_pos: LanePosition = shared_memory()
     right_vec: Vec2 = shared_memory()
     hold_handle: HoldHandle = shared_memory()
+    hold_owner_ref: EntityRef[Note] = shared_memory()
+    head_ref: EntityRef[Note] = shared_memory()
 
     pos: LanePosition = entity_data()
-    target_time: float = entity_data()
     input_target_time: float = entity_data()
     input_time: Interval = entity_data()
-    window: JudgmentWindow = entity_data()
-    bucket: Bucket = entity_data()
-    body_sprite: Sprite = entity_data()
-    arrow_sprite: Sprite = entity_data()
-    head_sprite: Sprite = entity_data()
-    connector_sprite: Sprite = entity_data()
-    particle: Particle = entity_data()
-    hold_particle: Particle = entity_data()
+    kind: int = entity_data()
     start_time: float = entity_data()
     target_scaled_time: float = entity_data()
     next_note_ref: EntityRef[Note] = entity_data()
+    sim_parent_ref: EntityRef[Note] = entity_data()
+    effective_spawn_time: float = entity_data()
+    control_times: Array[float, CONTROL_POINT_COUNT] = entity_data()
+    control_scaled_times: Array[float, CONTROL_POINT_COUNT] = entity_data()
 
-    started: bool = entity_memory()
+    drawn: DrawCount = entity_memory()
+    drawn_connector: DrawCount = entity_memory()
 
     finish_time: float = exported()
     judgment: Judgment = exported()
@@ -116,18 +130,13 @@ class Note(PlayArchetype):
             self.prev.direction = self.lane - self.prev.lane
 
         self.pos @= lane_to_pos(self.lane)
-        self.target_time = beat_to_time(self.beat)
+        if self.target_time == 0:
+            self.target_time = beat_to_time(self.beat)
         self.input_target_time = self.target_time + input_offset()
-        self.input_time = note_window(self.variant).good + self.input_target_time
-        self.window @= note_window(self.variant)
-        self.bucket @= note_bucket(self.variant)
-        self.body_sprite @= note_body_sprite(self.variant, self.direction)
-        self.arrow_sprite @= note_arrow_sprite(self.variant, self.direction)
-        self.head_sprite @= note_head_sprite(self.variant)
-        self.connector_sprite @= note_connector_sprite(self.variant)
-        self.particle @= note_particle(self.variant, self.direction)
-        self.hold_particle @= note_hold_particle(self.variant)
+        self.kind = note_kind_index(self.variant, self.direction)
+        self.input_time = self.window.good + self.input_target_time
 
+        self.preprocess_control_points()
         self.start_time, self.target_scaled_time = self.timescale_group.get_note_times(self.target_time)
 
         self.base_hitbox_pos @= lane_hitbox_pos(
@@ -144,25 +153,78 @@ class Note(PlayArchetype):
         if self.has_prev and not (Options.boxy_sliders and self.variant == NoteVariant.HOLD_ANCHOR):
             self.prev_note_ref.get().next_note_ref @= self.ref()
 
-    def spawn_time(self) -> float:
-        return min(self.start_time, self.prev_start_time, self.sim_start_time)
+        self.preprocess_chain_head()
+        self.preprocess_spawn_time()
+
+    def preprocess_control_points(self):
+        # Control points come before this note, so they're converted first to keep timescale lookups in order.
+        if Options.boxy_sliders:
+            self.control_count = 0
+        for i in range(self.control_count):
+            if Options.mirror:
+                self.control_points[i].lane = -self.control_points[i].lane
+            self.control_times[i] = beat_to_time(self.control_points[i].beat)
+            _, scaled_time = self.timescale_group.get_note_times(self.control_times[i])
+            self.control_scaled_times[i] = scaled_time
+
+    def preprocess_chain_head(self):
+        # The chain head holds the hold particle and the ref of the note currently driving it.
+        self.head_ref @= self.ref()
+        if not self.has_prev:
+            self.hold_owner_ref @= self.ref()
+            return
+        ref = copy(self.prev_note_ref)
+        while ref.index > self.index and ref.get().has_prev:
+            ref @= ref.get().prev_note_ref
+        if ref.index < self.index:
+            self.head_ref @= ref.get().head_ref
+        else:
+            self.head_ref @= ref
+
+    def preprocess_spawn_time(self):
+        # A note spawns with its prev, so its connector is there from the start, and with its whole sim chain.
+        # Preprocessing runs in index order, so this note pulls from the notes before it and pushes its start
+        # time to any that depend on it. Notes after this one pull for themselves.
+        self.effective_spawn_time = self.start_time
+        if self.has_prev and self.prev_note_ref.index < self.index:
+            self.effective_spawn_time = min(self.effective_spawn_time, self.prev.start_time)
+        if self.has_sim:
+            self.sim_note.sim_parent_ref @= self.ref()
+            if self.sim_note_ref.index < self.index:
+                self.effective_spawn_time = min(self.effective_spawn_time, self.sim_note.effective_spawn_time)
+        if self.sim_parent_ref.index > 0:
+            self.effective_spawn_time = min(self.effective_spawn_time, self.sim_parent_ref.get().effective_spawn_time)
+        self.lower_sim_spawn_times(self.index)
+        if self.has_next and self.next_note_ref.index < self.index and self.start_time < self.next.effective_spawn_time:
+            self.next.effective_spawn_time = self.start_time
+            self.next.lower_sim_spawn_times(self.index)
+
+    def lower_sim_spawn_times(self, cursor: int):
+        # Sim notes form a chain, and preprocessed parts of it already share one spawn time,
+        # so each walk stops at the first note that is already early enough.
+        ref = copy(self.sim_note_ref)
+        while 0 < ref.index < cursor and ref.get().effective_spawn_time > self.effective_spawn_time:
+            ref.get().effective_spawn_time = self.effective_spawn_time
+            ref @= ref.get().sim_note_ref
+        ref @= self.sim_parent_ref
+        while ref.index > 0 and ref.get().effective_spawn_time > self.effective_spawn_time:
+            ref.get().effective_spawn_time = self.effective_spawn_time
+            ref @= ref.get().sim_parent_ref
 
     def spawn_order(self) -> float:
-        return self.spawn_time()
+        return self.effective_spawn_time
 
     def should_spawn(self) -> bool:
-        return time() >= self.spawn_time()
+        return time() >= self.effective_spawn_time
 
     def update_sequential(self):
         if self.missed_timing() or self.chain_miss():
-            self.despawn = True
-            self.finished = True
-            self.input_finished = True
+            self.finish()
         self.y = note_y(self.timescale_group.scaled_time, self.target_scaled_time)
-        if self.has_sim and self.sim_note.is_waiting:
-            self.sim_note.y = note_y(self.sim_note.timescale_group.scaled_time, self.sim_note.target_scaled_time)
         if self.variant == NoteVariant.HOLD_ANCHOR:
-            self.input_finished = self.prev.input_finished or self.prev.is_despawned
+            self.flags = set_flag(
+                self.flags, NoteFlag.INPUT_FINISHED, self.prev.input_finished or self.prev.is_despawned
+            )
         if (
             not self.input_finished
             and self.touch_id == 0
@@ -174,24 +236,56 @@ class Note(PlayArchetype):
             and self.variant != NoteVariant.HOLD_ANCHOR
         ):
             input_note_indexes.append(self.index)
-        if self.has_prev and self.prev.is_despawned and self.prev.touch_id == 0:
-            if self.hold_handle == self.prev.hold_handle:
-                self.hold_handle.destroy()
-            self.prev.hold_handle.destroy()
-        if self.has_prev and self.prev.hold_handle != self.hold_handle and self.prev.hold_handle.is_active:
-            self.hold_handle.destroy()
-            self.hold_handle @= self.prev.hold_handle
         self.update_particle()
+        self.update_visibility()
+        if Options.debug_counters:
+            # Level memory can't be written in update_parallel, so the last frame's draws are counted here.
+            debug_count(DebugCounter.NOTES)
+            debug_count(DebugCounter.DRAWS, self.drawn.sprites + self.drawn_connector.sprites)
+            debug_count(DebugCounter.CONNECTOR_SEGMENTS, self.drawn_connector.sprites)
+            debug_count(DebugCounter.TRANSFORMS, self.drawn.transforms + self.drawn_connector.transforms)
 
     def update_parallel(self):
+        self.draw()
+
+    def draw(self):
+        self.drawn = zeros(DrawCount)
+        self.drawn_connector = zeros(DrawCount)
         if self.despawn:
             return
         if Options.boxy_sliders and self.variant == NoteVariant.HOLD_ANCHOR:
             return
-        self.draw_body()
-        self.draw_connector()
-        self.draw_arrow()
-        self.draw_sim_line()
+        flags = self.flags
+        if has_flag(flags, NoteFlag.BODY_VISIBLE):
+            self.draw_body()
+            self.draw_arrow()
+        if has_flag(flags, NoteFlag.CONNECTOR_VISIBLE):
+            self.draw_connector()
+        if has_flag(flags, NoteFlag.SIM_LINE_VISIBLE):
+            self.draw_sim_line()
+
+    def update_visibility(self):
+        # A finished prev means the connector is drawn from the judge line, so it can't be culled by span.
+        self.flags = with_visibility(
+            self.flags,
+            body=y_on_stage(self.y),
+            connector=self.has_prev and (self.prev.finished or self.connector_on_stage()),
+            sim_line=Options.sim_lines_enabled and self.has_sim and span_on_stage(self.y, self.sim_y()),
+        )
+
+    def connector_on_stage(self) -> bool:
+        # The path bends through its control points, which can lie outside the span between the two notes.
+        low = min(self.y, self.prev.y)
+        high = max(self.y, self.prev.y)
+        for i in range(self.control_count):
+            y = self.control_y(i)
+            low = min(low, y)
+            high = max(high, y)
+        return span_on_stage(low, high)
+
+    def sim_y(self) -> float:
+        # A sim note with a higher index hasn't updated its y yet this frame, so it's computed here instead.
+        return note_y(self.sim_note.timescale_group.scaled_time, self.sim_note.target_scaled_time)
 
     def missed_timing(self) -> bool:
         return time() > self.input_time.end
@@ -203,7 +297,7 @@ class Note(PlayArchetype):
 
     def draw_body(self):
         if self.variant != NoteVariant.HOLD_ANCHOR:
-            draw_note_body(
+            self.drawn += draw_note_body(
                 sprite=self.body_sprite,
                 pos=self.pos,
                 y=self.y,
@@ -226,59 +320,95 @@ class Note(PlayArchetype):
             ref @= self.prev_note_ref
         prev = ref.get()
         if not prev_finished:
-            draw_note_connector(
-                sprite=self.connector_sprite,
-                pos=self.pos,
-                y=self.y,
-                prev_pos=prev.pos,
-                prev_y=prev.y,
-            )
+            self.draw_connector_path(prev.pos, prev.y, 0)
         elif time() < self.target_time:
             if prev.touch_id == 0:
                 return
-            prev_target_time = prev.target_time
-            target_time = self.target_time
-            progress = max(0, unlerp(prev_target_time, target_time, time()))
-            prev_pos = lerp(prev.pos, self.pos, progress)
+            passed = self.passed_control_count()
+            prev_pos = self.hold_pos(prev, passed)
             if Options.boxy_sliders:
                 prev_pos @= self.pos
-            draw_note_connector(
-                sprite=self.connector_sprite,
-                pos=self.pos,
-                y=self.y,
-                prev_pos=prev_pos,
-                prev_y=0,
-            )
-            draw_note_head(
+            self.draw_connector_path(prev_pos, 0, passed)
+            self.drawn += draw_note_head(
                 sprite=self.head_sprite,
                 pos=prev_pos,
                 y=0,
             )
         elif self.variant != NoteVariant.HOLD_END and self.prev.touch_id != 0:
-            draw_note_head(
+            self.drawn += draw_note_head(
                 sprite=self.head_sprite,
                 pos=self.pos,
                 y=0,
             )
 
+    def draw_connector_path(self, prev_pos: LanePosition, prev_y: float, first_control: int):
+        from_pos = copy(prev_pos)
+        from_y = prev_y
+        for i in range(first_control, self.control_count):
+            pos = self.control_pos(i)
+            y = self.control_y(i)
+            self.drawn_connector += draw_note_connector(
+                sprite=self.connector_sprite,
+                pos=pos,
+                y=y,
+                prev_pos=from_pos,
+                prev_y=from_y,
+            )
+            from_pos @= pos
+            from_y = y
+        self.drawn_connector += draw_note_connector(
+            sprite=self.connector_sprite,
+            pos=self.pos,
+            y=self.y,
+            prev_pos=from_pos,
+            prev_y=from_y,
+        )
+
+    def control_pos(self, i: int) -> LanePosition:
+        return lane_to_pos(self.control_points[i].lane)
+
+    def control_y(self, i: int) -> float:
+        return note_y(self.timescale_group.scaled_time, self.control_scaled_times[i])
+
+    def passed_control_count(self) -> int:
+        passed = 0
+        for i in range(self.control_count):
+            if time() >= self.control_times[i]:
+                passed += 1
+        return passed
+
+    def hold_pos(self, prev: Note, passed: int) -> LanePosition:
+        # The hold moves along the segment between the last control point it passed and the next one.
+        from_pos = copy(prev.pos)
+        from_time = prev.target_time
+        if passed > 0:
+            from_pos @= self.control_pos(passed - 1)
+            from_time = self.control_times[passed - 1]
+        to_pos = copy(self.pos)
+        to_time = self.target_time
+        if passed < self.control_count:
+            to_pos @= self.control_pos(passed)
+            to_time = self.control_times[passed]
+        return lerp(from_pos, to_pos, max(0, unlerp(from_time, to_time, time())))
+
     def draw_arrow(self):
         match self.variant:
             case NoteVariant.FLICK | NoteVariant.DIRECTIONAL_FLICK:
-                draw_note_arrow(
+                self.drawn += draw_note_arrow(
                     sprite=self.arrow_sprite,
                     direction=self.direction,
                     pos=self.pos,
                     y=self.y,
                 )
             case NoteVariant.SWING:
-                draw_swing_arrow(
+                self.drawn += draw_swing_arrow(
                     sprite=self.arrow_sprite,
                     direction=self.direction,
                     pos=self.pos,
                     y=self.y,
                 )
             case NoteVariant.HOLD_START | NoteVariant.HOLD_TICK if Options.boxy_sliders and self.direction != 0:
-                draw_swing_arrow(
+                self.drawn += draw_swing_arrow(
                     sprite=self.arrow_sprite,
                     direction=self.direction,
                     pos=self.pos,
@@ -293,7 +423,7 @@ class Note(PlayArchetype):
         sim = self.sim_note
         if sim.is_despawned:
             return
-        draw_note_sim_line(
+        self.drawn += draw_note_sim_line(
             pos=self.pos,
             y=self.y,
             sim_pos=sim.pos,
@@ -303,46 +433,35 @@ class Note(PlayArchetype):
     def update_particle(self):
         if Options.boxy_sliders and self.variant == NoteVariant.HOLD_ANCHOR:
             return
-        if not self.has_prev:
+        if not self.has_prev or self.head.hold_owner_ref.index != self.index:
             return
-        prev_finished = True
-        ref = copy(self.prev_note_ref)
-        for _ in range(20):
-            # Handle a tick finishing before previous anchors by looking further back.
-            prev_finished = prev_finished and ref.get().finished
-            if not prev_finished:
-                break
-            if not ref.get().has_prev:
-                break
-            ref @= ref.get().prev_note_ref
-        if prev_finished:
-            ref @= self.prev_note_ref
-        prev = ref.get()
-        if not prev_finished:
-            if self.hold_handle != prev.hold_handle:
-                self.hold_handle.destroy()
-                self.hold_handle @= prev.hold_handle
+        # Ownership only moves past finished notes, so the owner's prev has always finished.
+        prev = self.prev
+        if prev.touch_id == 0:
+            self.head.hold_handle.destroy()
         elif time() < self.target_time:
-            if prev.touch_id == 0:
-                self.hold_handle.destroy()
-            else:
-                prev_target_time = prev.target_time
-                target_time = self.target_time
-                progress = max(0, unlerp(prev_target_time, target_time, time()))
-                prev_pos = lerp(prev.pos, self.pos, progress)
-                if Options.boxy_sliders:
-                    prev_pos @= self.pos
-                self.hold_handle.update(
-                    particle=self.hold_particle,
-                    pos=prev_pos,
-                )
-        elif self.variant != NoteVariant.HOLD_END and self.prev.touch_id != 0:
-            self.hold_handle.update(
+            prev_pos = self.hold_pos(prev, self.passed_control_count())
+            if Options.boxy_sliders:
+                prev_pos @= self.pos
+            self.head.hold_handle.update(
+                particle=self.hold_particle,
+                pos=prev_pos,
+            )
+        elif self.variant != NoteVariant.HOLD_END:
+            self.head.hold_handle.update(
                 particle=self.hold_particle,
                 pos=self.pos,
             )
-        else:
-            pass
+
+    def pass_hold_ownership(self):
+        if self.head.hold_owner_ref.index != self.index:
+            return
+        ref = copy(self.next_note_ref)
+        while ref.index > 0 and ref.get().finished:
+            ref @= ref.get().next_note_ref
+        self.head.hold_owner_ref @= ref
+        if ref.index == 0:
+            self.head.hold_handle.destroy()
 
     def touch(self):
         if self.has_prev and not (self.prev.is_despawned or self.prev.input_finished):
@@ -386,9 +505,9 @@ class Note(PlayArchetype):
         if self.touch_id == 0:
             return
         hitbox = self.get_hitbox()
-        for touch in touches():
-            if touch.id != self.touch_id:
-                continue
+        index = find_touch(self.touch_id)
+        if index >= 0:
+            touch = touches()[index]
             if not touch.ended:
                 return
             if touch.time >= self.input_time.start and hitbox(touch.position):
@@ -405,31 +524,27 @@ class Note(PlayArchetype):
         if self.touch_id == 0:
             if time() not in self.input_time:
                 if self.has_prev and self.prev.touch_id != 0:
-                    for touch in touches():
-                        if touch.id != self.prev.touch_id:
-                            continue
-                        if touch.ended:
-                            self.fail(touch.time)
-                            return
-                        break
-                    else:
+                    index = find_touch(self.prev.touch_id)
+                    if index < 0:
                         self.fail(time() - input_offset())
+                    elif touches()[index].ended:
+                        self.fail(touches()[index].time)
                 return
             hitbox = self.get_hitbox()
             if self.has_prev and self.prev.touch_id != 0:
-                for touch in touches():
-                    if touch.id == self.prev.touch_id:
-                        if hitbox(touch.position):
-                            mark_touch_used(touch)
-                            self.touch_id = touch.id
-                            break
-                        elif touch.ended:
-                            self.fail(touch.time)
-                            return
-                        else:
-                            return
-                else:
+                index = find_touch(self.prev.touch_id)
+                if index < 0:
                     self.fail(time() - input_offset())
+                else:
+                    touch = touches()[index]
+                    if hitbox(touch.position):
+                        mark_touch_used(touch)
+                        self.touch_id = touch.id
+                    elif touch.ended:
+                        self.fail(touch.time)
+                        return
+                    else:
+                        return
             else:
                 for touch in taps():
                     if not hitbox(touch.position):
@@ -440,45 +555,45 @@ class Note(PlayArchetype):
                 else:
                     return
         target_velocity = flick_velocity_threshold(self.direction)
-        for touch in touches():
-            if touch.id != self.touch_id:
-                continue
-            met_velocity = touch.velocity.magnitude >= target_velocity
-            met_direction = self.direction == 0 or (self.right_vec * self.direction).dot(touch.delta) >= 0
-            met = met_velocity and met_direction
-            if self.started:
-                if time() >= self.input_target_time:
-                    # The touch has continuously met the flick criteria into the target time.
-                    self.complete(self.target_time)
-                elif (not met and not self.has_prev) or touch.ended:
-                    # The touch has stopped meeting the flick criteria or ended before the target time.
-                    # We also make an exception for hold-flicks.
-                    self.complete(touch.time)
-                else:
-                    # The touch has continuously met the flick criteria, but we haven't reached the target time yet.
-                    pass
-            elif met:
-                if touch.time >= self.target_time:
-                    # The touch has just met the flick criteria after the target time.
-                    self.complete(
-                        touch.time
-                        if touch.start_time < (self.window + self.target_time).perfect.start
-                        else touch.start_time
-                    )
-                elif touch.time >= self.input_time.start:
-                    # The touch has just met the flick criteria before the target time.
-                    self.started = True
-                else:
-                    # The touch has just met the flick criteria before the input time.
-                    pass
-            elif touch.ended:
-                # The touch has ended without ever meeting the flick criteria.
-                self.fail(touch.time)
+        index = find_touch(self.touch_id)
+        if index < 0:
+            self.fail(time() - input_offset())
+            return
+        touch = touches()[index]
+        met_velocity = touch.velocity.magnitude >= target_velocity
+        met_direction = self.direction == 0 or (self.right_vec * self.direction).dot(touch.delta) >= 0
+        met = met_velocity and met_direction
+        if self.started:
+            if time() >= self.input_target_time:
+                # The touch has continuously met the flick criteria into the target time.
+                self.complete(self.target_time)
+            elif (not met and not self.has_prev) or touch.ended:
+                # The touch has stopped meeting the flick criteria or ended before the target time.
+                # We also make an exception for hold-flicks.
+                self.complete(touch.time)
             else:
-                # The touch is ongoing, but it's never met the flick criteria.
+                # The touch has continuously met the flick criteria, but we haven't reached the target time yet.
                 pass
-            return
-        self.fail(time() - input_offset())
+        elif met:
+            if touch.time >= self.target_time:
+                # The touch has just met the flick criteria after the target time.
+                self.complete(
+                    touch.time
+                    if touch.start_time < (self.window + self.target_time).perfect.start
+                    else touch.start_time
+                )
+            elif touch.time >= self.input_time.start:
+                # The touch has just met the flick criteria before the target time.
+                self.flags = set_flag(self.flags, NoteFlag.STARTED, True)
+            else:
+                # The touch has just met the flick criteria before the input time.
+                pass
+        elif touch.ended:
+            # The touch has ended without ever meeting the flick criteria.
+            self.fail(touch.time)
+        else:
+            # The touch is ongoing, but it's never met the flick criteria.
+            pass
 
     def handle_hold_input(self):
         hitbox = self.get_hitbox()
@@ -496,9 +611,9 @@ class Note(PlayArchetype):
                     break
                 else:
                     return
-        for touch in touches():
-            if touch.id != self.touch_id:
-                continue
+        index = find_touch(self.touch_id)
+        if index >= 0:
+            touch = touches()[index]
             if hitbox(touch.position):
                 if touch.ended:
                     # The touch has ended in the hitbox.
@@ -516,7 +631,7 @@ class Note(PlayArchetype):
                         self.complete(time() - input_offset())
                 elif time() >= self.input_time.start:
                     # The touch is in the hitbox, but we haven't reached the target time yet.
-                    self.started = True
+                    self.flags = set_flag(self.flags, NoteFlag.STARTED, True)
                 else:
                     # The touch is ongoing and in the hitbox, but it's not yet in the input time.
                     pass
@@ -540,10 +655,8 @@ class Note(PlayArchetype):
         if self.prev.touch_id == 0:
             self.fail(time() - input_offset())
         self.touch_id = self.prev.touch_id
-        for touch in touches():
-            if touch.id == self.touch_id and not touch.ended:
-                break
-        else:
+        index = find_touch(self.touch_id)
+        if index < 0 or touches()[index].ended:
             self.fail(time() - input_offset())
         if time() >= self.target_time:
             self.complete(time() - input_offset())
@@ -553,9 +666,14 @@ class Note(PlayArchetype):
             self.touch_id = self.prev.touch_id
         target_velocity = swing_velocity_threshold()
         hitbox = self.get_hitbox()
-        for touch in touches():
-            if self.touch_id != 0 and touch.id != self.touch_id:
-                continue
+        # A touch carried over from the previous note is looked up directly instead of scanning every touch.
+        first = 0
+        last = len(touches())
+        if self.touch_id != 0:
+            first = find_touch(self.touch_id)
+            last = first + 1 if first >= 0 else first
+        for i in range(first, last):
+            touch = touches()[i]
             if self.touch_id == 0 and touch_is_used(touch):
                 continue
             velocity_met = touch.velocity.magnitude >= target_velocity
@@ -586,7 +704,7 @@ class Note(PlayArchetype):
                     # The touch has just met the swing criteria before the target time.
                     self.touch_id = touch.id
                     mark_touch_used(touch)
-                    self.started = True
+                    self.flags = set_flag(self.flags, NoteFlag.STARTED, True)
                     if touch.ended:
                         self.complete(touch.time)
                 else:
@@ -611,6 +729,9 @@ class Note(PlayArchetype):
             self.fail(time() - input_offset())
 
     def get_hitbox(self) -> Callable[[Vec2], bool]:
+        # Only called from touch handlers, so the counter can be written here but not in the returned closure.
+        if Options.debug_counters:
+            debug_count(DebugCounter.HITBOXES)
         hitbox_pos = copy(self.base_hitbox_pos)
         if self.touch_id != 0 or (self.has_prev and self.prev.touch_id != 0):
             pass
@@ -658,9 +779,7 @@ class Note(PlayArchetype):
                 pos=self.pos,
                 judgment=judgment,
             )
-        self.despawn = True
-        self.finished = True
-        self.input_finished = True
+        self.finish()
 
     def fail(self, actual_time: float):
         judgment = Judgment.MISS
@@ -670,19 +789,68 @@ class Note(PlayArchetype):
         self.result.bucket @= self.bucket
         self.result.bucket_value = self.result.accuracy * 1000
         self.touch_id = 0
+        self.finish()
+
+    def finish(self):
         self.despawn = True
-        self.finished = True
-        self.input_finished = True
+        self.flags = set_flag(set_flag(self.flags, NoteFlag.FINISHED, True), NoteFlag.INPUT_FINISHED, True)
+        self.pass_hold_ownership()
 
     def terminate(self):
-        if not self.has_next or self.next.hold_handle != self.hold_handle:
-            self.hold_handle.handle.destroy()
         self.finish_time = time()
 
+    @property
+    def input_finished(self) -> bool:
+        return has_flag(self.flags, NoteFlag.INPUT_FINISHED)
+
+    @property
+    def finished(self) -> bool:
+        return has_flag(self.flags, NoteFlag.FINISHED)
+
+    @property
+    def started(self) -> bool:
+        return has_flag(self.flags, NoteFlag.STARTED)
+
     @property
     def timescale_group(self) -> TimescaleGroup:
         return self.timescale_group_ref.get()
 
+    @property
+    def note_kind(self) -> NoteKind:
+        return note_kinds[self.kind]
+
+    @property
+    def window(self) -> JudgmentWindow:
+        return self.note_kind.window
+
+    @property
+    def bucket(self) -> Bucket:
+        return self.note_kind.bucket
+
+    @property
+    def body_sprite(self) -> Sprite:
+        return self.note_kind.body_sprite
+
+    @property
+    def arrow_sprite(self) -> Sprite:
+        return self.note_kind.arrow_sprite
+
+    @property
+    def head_sprite(self) -> Sprite:
+        return self.note_kind.head_sprite
+
+    @property
+    def connector_sprite(self) -> Sprite:
+        return self.note_kind.connector_sprite
+
+    @property
+    def particle(self) -> Particle:
+        return self.note_kind.particle
+
+    @property
+    def hold_particle(self) -> Particle:
+        return self.note_kind.hold_particle
+
     @property
     def prev(self) -> Note:
         return self.prev_note_ref.get()
@@ -691,12 +859,6 @@ class Note(PlayArchetype):
     def has_prev(self) -> bool:
         return self.prev_note_ref.index > 0
 
-    @property
-    def prev_start_time(self) -> float:
-        if not self.has_prev:
-            return 1e8
-        return self.prev_note_ref.get().start_time
-
     @property
     def sim_note(self) -> Note:
         return self.sim_note_ref.get()
@@ -706,10 +868,8 @@ class Note(PlayArchetype):
         return self.sim_note_ref.index > 0
 
     @property
-    def sim_start_time(self) -> float:
-        if not self.has_sim:
-            return 1e8
-        return self.sim_note.start_time
+    def head(self) -> Note:
+        return self.head_ref.get()
 
     @property
     def has_next(self) -> bool:
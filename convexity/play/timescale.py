@@ -22,6 +22,7 @@ class TimescaleGroup(PlayArchetype):
     last_note_time: float = shared_memory()
     last_time_to_scaled_time_i: int = shared_memory()
     last_scaled_time_to_time_i: int = shared_memory()
+    section_count: int = shared_memory()
 
     offset: float = entity_memory()
 
@@ -32,19 +33,22 @@ class TimescaleGroup(PlayArchetype):
         self.last_note_time = 1e8
 
         i = self.index + 1
+        while TimescaleChange.is_at(i):
+            change = TimescaleChange.at(i)
+            change.start_time = beat_to_time(change.beat) if change.beat > 0 else -10
+            i += 1
+        self.section_count = i - self.index - 1
+
         scaled_time = 0
-        while True:
-            if not TimescaleChange.is_at(i):
-                break
+        for i in range(self.index + 1, self.index + self.section_count + 1):
             change = TimescaleChange.at(i)
             change.start_scaled_time = scaled_time
-            if TimescaleChange.is_at(i + 1):
+            if i < self.index + self.section_count:
                 change.end_time = TimescaleChange.at(i + 1).start_time
             else:
                 change.end_time = 1e8
             change.end_scaled_time = scaled_time + change.scale * (change.end_time - change.start_time)
             scaled_time = change.end_scaled_time
-            i += 1
 
     def spawn_order(self) -> float:
         return -1e8
@@ -68,6 +72,18 @@ class TimescaleGroup(PlayArchetype):
     def section(self) -> TimescaleChange:
         return TimescaleChange.at(self.index + self.offset)
 
+    def find_section(self, real_time: float) -> int:
+        # Sections are sorted by start time, so binary search for the last one starting at or before real_time.
+        lo = self.index + 1
+        hi = self.index + self.section_count
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if TimescaleChange.at(mid).start_time <= real_time:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
     def _time_to_scaled_time(self, real_time: float) -> float:
         if Options.disable_soflan:
             return real_time
@@ -111,7 +127,7 @@ class TimescaleGroup(PlayArchetype):
     def get_note_times(self, target_time: float) -> tuple[float, float]:
         if target_time < self.last_note_time:
             # As long as the notes are increasing in time, we can start from the indexes we last visited
-            self.last_time_to_scaled_time_i = self.index + 1
+            self.last_time_to_scaled_time_i = self.find_section(target_time)
             self.last_scaled_time_to_time_i = self.index + 1
         self.last_note_time = target_time
         scaled_time = self._time_to_scaled_time(target_time)
@@ -124,14 +140,11 @@ class TimescaleChange(PlayArchetype):
     beat: float = imported()
     scale: float = imported()
 
+    start_time: float = shared_memory()
     start_scaled_time: float = shared_memory()
     end_scaled_time: float = shared_memory()
     end_time: float = shared_memory()
 
-    @property
-    def start_time(self) -> float:
-        return beat_to_time(self.beat) if self.beat > 0 else -10
-
     def should_spawn(self) -> bool:
         return True
 
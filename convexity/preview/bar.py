@@ -1,4 +1,13 @@
-from sonolus.script.archetype import PreviewArchetype, StandardArchetypeName, StandardImport, entity_data, imported
+from math import floor
+
+from sonolus.script.archetype import (
+    PreviewArchetype,
+    StandardArchetypeName,
+    StandardImport,
+    callback,
+    entity_data,
+    imported,
+)
 from sonolus.script.printing import PrintColor, PrintFormat
 from sonolus.script.timing import beat_to_starting_beat, beat_to_time
 
@@ -15,9 +24,25 @@ class BpmChange(PreviewArchetype):
     meter: int = imported()
 
     time: float = entity_data()
+    measure_count: int = entity_data()
 
+    @callback(order=1)
     def preprocess(self):
+        # Runs after notes so PreviewData.last_beat is final.
         self.time = beat_to_time(self.beat)
+        self.measure_count = 0
+        if self.meter < 1:
+            return
+        # Measures stay in this bpm section up to the next bpm change, so binary search for the last one.
+        lo = 0
+        hi = max(0, floor((PreviewData.last_beat - self.beat) / self.meter))
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if beat_to_starting_beat(self.beat + mid * self.meter) == self.beat:
+                lo = mid
+            else:
+                hi = mid - 1
+        self.measure_count = lo
 
     def render(self):
         Skin.bpm_change_line.draw(
@@ -33,13 +58,11 @@ class BpmChange(PreviewArchetype):
             color=PrintColor.PURPLE,
             side="right",
         )
-        beat = self.beat + self.meter
-        if self.meter < 1:
-            return
-        while beat_to_starting_beat(beat) == self.beat and beat <= PreviewData.last_beat:
+        measure_secs = self.meter * 60 / self.bpm
+        for i in range(1, self.measure_count + 1):
+            time = self.time + i * measure_secs
             Skin.measure_line.draw(
-                inner_line_layout(beat_to_time(beat)),
-                z=Layer.MEASURE_LINE - beat_to_time(beat) / 100,
+                inner_line_layout(time),
+                z=Layer.MEASURE_LINE - time / 100,
                 a=LINE_ALPHA,
             )
-            beat += self.meter
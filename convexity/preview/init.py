@@ -15,6 +15,7 @@ from sonolus.script.runtime import (
 from sonolus.script.vec import Vec2
 
 from convexity.common.layout import Layer, init_layout
+from convexity.common.note import init_note_kinds
 from convexity.common.skin import Skin
 from convexity.preview.layout import (
     COVER_ALPHA,
@@ -26,6 +27,7 @@ from convexity.preview.layout import (
     init_preview_layout,
     left_line_layout,
     print_at_time,
+    time_mark_interval,
 )
 
 
@@ -34,6 +36,7 @@ class Init(PreviewArchetype):
     def preprocess(self):
         init_layout()
         init_preview_layout()
+        init_note_kinds()
 
         ui.menu.update(
             anchor=screen().tl + Vec2(0.05, -0.05),
@@ -53,30 +56,30 @@ class Init(PreviewArchetype):
         )
 
     def render(self):
-        for col in range(PreviewLayout.column_count):
-            l = col * PreviewLayout.column_width - screen().w / 2
-            r = l + PreviewLayout.column_width
-            Skin.cover.draw(
-                Rect(
-                    l=l,
-                    r=r,
-                    b=-1,
-                    t=Y_B,
-                ),
-                z=Layer.COVER,
-                a=COVER_ALPHA,
-            )
-            Skin.cover.draw(
-                Rect(
-                    l=l,
-                    r=r,
-                    b=Y_T,
-                    t=1,
-                ),
-                z=Layer.COVER,
-                a=COVER_ALPHA,
-            )
-        for time in range(floor(PreviewData.last_time) + 1):
+        # Columns are laid out edge to edge, so their covers form one strip at the bottom and one at the top.
+        l = -screen().w / 2
+        r = l + PreviewLayout.column_count * PreviewLayout.column_width
+        Skin.cover.draw(
+            Rect(
+                l=l,
+                r=r,
+                b=-1,
+                t=Y_B,
+            ),
+            z=Layer.COVER,
+            a=COVER_ALPHA,
+        )
+        Skin.cover.draw(
+            Rect(
+                l=l,
+                r=r,
+                b=Y_T,
+                t=1,
+            ),
+            z=Layer.COVER,
+            a=COVER_ALPHA,
+        )
+        for time in range(0, floor(PreviewData.last_time) + 1, time_mark_interval()):
             print_at_time(
                 time,
                 time,
@@ -12,6 +12,7 @@ from convexity.common.layout import LanePosition
 from convexity.common.options import Options
 
 COLUMN_SECS = 2
+MAX_TIME_MARKS = 120
 MARGIN_Y = 0.1
 MARGIN_X = 0.25
 TEXT_MARGIN_X = 0.015
@@ -50,6 +51,14 @@ def init_preview_layout():
     )
 
 
+def time_mark_interval() -> int:
+    # Long charts mark every few columns instead of every second, so the number of marks stays bounded.
+    interval = ceil((floor(PreviewData.last_time) + 1) / MAX_TIME_MARKS)
+    if interval <= 1:
+        return 1
+    return COLUMN_SECS * ceil(interval / COLUMN_SECS)
+
+
 def time_to_col(time: float) -> int:
     return trunc(time / COLUMN_SECS)
 
@@ -1,16 +1,19 @@
 from __future__ import annotations
 
 from sonolus.script.archetype import EntityRef, PreviewArchetype, entity_data, imported
+from sonolus.script.array import Array
 from sonolus.script.sprite import Sprite
 from sonolus.script.timing import beat_to_time
+from sonolus.script.values import copy
 
 from convexity.common.layout import LanePosition, Layer, lane_to_pos
 from convexity.common.note import (
+    CONTROL_POINT_COUNT,
+    ControlPoint,
+    NoteKind,
     NoteVariant,
-    note_arrow_sprite,
-    note_body_sprite,
-    note_connector_sprite,
-    note_head_sprite,
+    note_kind_index,
+    note_kinds,
 )
 from convexity.common.options import Options
 from convexity.common.skin import Skin
@@ -31,16 +34,16 @@ class Note(PreviewArchetype):
     beat: float = imported()
     lane: float = imported()
     direction: float = imported()
+    target_time: float = imported()
     prev_note_ref: EntityRef[Note] = imported()
     sim_note_ref: EntityRef[Note] = imported()
+    control_points: Array[ControlPoint, CONTROL_POINT_COUNT] = imported()
+    control_count: int = imported()
 
     pos: LanePosition = entity_data()
-    target_time: float = entity_data()
-    body_sprite: Sprite = entity_data()
-    arrow_sprite: Sprite = entity_data()
-    head_sprite: Sprite = entity_data()
-    connector_sprite: Sprite = entity_data()
+    kind: int = entity_data()
     next_note_ref: EntityRef[Note] = entity_data()
+    control_times: Array[float, CONTROL_POINT_COUNT] = entity_data()
 
     def preprocess(self):
         if Options.mirror:
@@ -61,11 +64,16 @@ class Note(PreviewArchetype):
             self.prev.direction = self.lane - self.prev.lane
 
         self.pos @= lane_to_pos(self.lane)
-        self.target_time = beat_to_time(self.beat)
-        self.body_sprite @= note_body_sprite(self.variant, self.direction)
-        self.arrow_sprite @= note_arrow_sprite(self.variant, self.direction)
-        self.head_sprite @= note_head_sprite(self.variant)
-        self.connector_sprite @= note_connector_sprite(self.variant)
+        if self.target_time == 0:
+            self.target_time = beat_to_time(self.beat)
+        self.kind = note_kind_index(self.variant, self.direction)
+
+        if Options.boxy_sliders:
+            self.control_count = 0
+        for i in range(self.control_count):
+            if Options.mirror:
+                self.control_points[i].lane = -self.control_points[i].lane
+            self.control_times[i] = beat_to_time(self.control_points[i].beat)
 
         PreviewData.last_time = max(PreviewData.last_time, self.target_time)
         PreviewData.last_beat = max(PreviewData.last_beat, self.beat)
@@ -92,31 +100,32 @@ class Note(PreviewArchetype):
     def draw_connector(self):
         if not self.has_prev:
             return
-        prev_col = time_to_col(self.prev.target_time)
-        own_col = time_to_col(self.target_time)
-        for col in range(prev_col, own_col + 1):
-            if Options.boxy_sliders:
-                horizontal_time = self.prev.target_time + min(0.03, self.target_time - self.prev.target_time)
-                horizontal_pos = LanePosition(
-                    min(self.pos.left, self.prev.pos.left), max(self.pos.right, self.prev.pos.right)
-                )
-                self.connector_sprite.draw(
-                    connector_layout(horizontal_pos, horizontal_time, horizontal_pos, self.prev.target_time, col),
-                    z=Layer.CONNECTOR - self.target_time / 100 + self.pos.mid / 1000,
-                    a=Options.connector_alpha,
-                )
-                if horizontal_time < self.target_time:
-                    self.connector_sprite.draw(
-                        connector_layout(self.pos, self.target_time, self.pos, horizontal_time, col),
-                        z=Layer.CONNECTOR - self.target_time / 100 + self.pos.mid / 1000,
-                        a=Options.connector_alpha,
-                    )
-            else:
-                self.connector_sprite.draw(
-                    connector_layout(self.pos, self.target_time, self.prev.pos, self.prev.target_time, col),
-                    z=Layer.CONNECTOR - self.target_time / 100 + self.pos.mid / 1000,
-                    a=Options.connector_alpha,
-                )
+        if Options.boxy_sliders:
+            self.draw_boxy_connector()
+            return
+        prev_pos = copy(self.prev.pos)
+        prev_time = self.prev.target_time
+        for i in range(self.control_count):
+            pos = lane_to_pos(self.control_points[i].lane)
+            self.draw_connector_segment(pos, self.control_times[i], prev_pos, prev_time)
+            prev_pos @= pos
+            prev_time = self.control_times[i]
+        self.draw_connector_segment(self.pos, self.target_time, prev_pos, prev_time)
+
+    def draw_connector_segment(self, pos: LanePosition, target_time: float, prev_pos: LanePosition, prev_time: float):
+        for col in range(time_to_col(prev_time), time_to_col(target_time) + 1):
+            self.connector_sprite.draw(
+                connector_layout(pos, target_time, prev_pos, prev_time, col),
+                z=Layer.CONNECTOR - self.target_time / 100 + self.pos.mid / 1000,
+                a=Options.connector_alpha,
+            )
+
+    def draw_boxy_connector(self):
+        horizontal_time = self.prev.target_time + min(0.03, self.target_time - self.prev.target_time)
+        horizontal_pos = LanePosition(min(self.pos.left, self.prev.pos.left), max(self.pos.right, self.prev.pos.right))
+        self.draw_connector_segment(horizontal_pos, horizontal_time, horizontal_pos, self.prev.target_time)
+        if horizontal_time < self.target_time:
+            self.draw_connector_segment(self.pos, self.target_time, self.pos, horizontal_time)
 
     def draw_arrow(self):
         match self.variant:
@@ -158,6 +167,26 @@ class Note(PreviewArchetype):
             z=Layer.SIM_LINE - self.target_time / 100 + self.pos.mid / 1000,
         )
 
+    @property
+    def note_kind(self) -> NoteKind:
+        return note_kinds[self.kind]
+
+    @property
+    def body_sprite(self) -> Sprite:
+        return self.note_kind.body_sprite
+
+    @property
+    def arrow_sprite(self) -> Sprite:
+        return self.note_kind.arrow_sprite
+
+    @property
+    def head_sprite(self) -> Sprite:
+        return self.note_kind.head_sprite
+
+    @property
+    def connector_sprite(self) -> Sprite:
+        return self.note_kind.connector_sprite
+
     @property
     def prev(self) -> Note:
         return self.prev_note_ref.get()
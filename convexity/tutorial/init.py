@@ -10,10 +10,12 @@ from sonolus.script.runtime import (
 from sonolus.script.vec import Vec2
 
 from convexity.common.layout import init_layout
+from convexity.common.quality import init_quality
 
 
 def preprocess():
     init_layout()
+    init_quality()
 
     ui.menu.update(
         anchor=screen().tl + Vec2(0.05, -0.05),
@@ -11,8 +11,12 @@ from sonolus.script.runtime import (
 )
 from sonolus.script.vec import Vec2
 
+from convexity.common.debug import end_debug_frame
+from convexity.common.effect import reset_effect_budget
 from convexity.common.init import init_buckets, init_life, init_score
 from convexity.common.layout import init_layout
+from convexity.common.note import init_note_kinds
+from convexity.common.quality import init_quality, update_quality
 from convexity.watch.note import Note
 
 
@@ -24,6 +28,20 @@ class Init(WatchArchetype):
         init_life(Note)
         init_ui()
         init_layout()
+        init_quality()
+        init_note_kinds()
+
+    def spawn_time(self) -> float:
+        return -1e8
+
+    def despawn_time(self) -> float:
+        return 1e8
+
+    @callback(order=-1)
+    def update_sequential(self):
+        update_quality()
+        reset_effect_budget()
+        end_debug_frame()
 
 
 def init_ui():
@@ -9,21 +9,28 @@ from sonolus.script.archetype import (
     imported,
     shared_memory,
 )
+from sonolus.script.array import Array
 from sonolus.script.bucket import Bucket, Judgment, JudgmentWindow
 from sonolus.script.interval import lerp, unlerp
 from sonolus.script.particle import Particle
 from sonolus.script.runtime import is_replay, is_skip, time
 from sonolus.script.sprite import Sprite
 from sonolus.script.timing import beat_to_time
-from sonolus.script.values import copy
+from sonolus.script.values import copy, zeros
 
+from convexity.common.debug import DebugCounter, debug_count
 from convexity.common.layout import (
     LanePosition,
     lane_to_pos,
     note_y,
 )
 from convexity.common.note import (
+    CONTROL_POINT_COUNT,
+    ControlPoint,
+    DrawCount,
     HoldHandle,
+    NoteFlag,
+    NoteKind,
     NoteVariant,
     draw_note_arrow,
     draw_note_body,
@@ -31,16 +38,14 @@ from convexity.common.note import (
     draw_note_head,
     draw_note_sim_line,
     draw_swing_arrow,
-    note_arrow_sprite,
-    note_body_sprite,
-    note_bucket,
-    note_connector_sprite,
-    note_head_sprite,
-    note_hold_particle,
-    note_particle,
-    note_window,
+    has_flag,
+    note_kind_index,
+    note_kinds,
     play_watch_hit_effects,
     schedule_watch_hit_effects,
+    span_on_stage,
+    with_visibility,
+    y_on_stage,
 )
 from convexity.common.options import Options
 from convexity.watch.timescale import TimescaleGroup
@@ -53,29 +58,31 @@ class Note(WatchArchetype):
     beat: float = imported()
     lane: float = imported()
     direction: float = imported()
+    target_time: float = imported()
     timescale_group_ref: EntityRef[TimescaleGroup] = imported()
     prev_note_ref: EntityRef[Note] = imported()
     sim_note_ref: EntityRef[Note] = imported()
+    control_points: Array[ControlPoint, CONTROL_POINT_COUNT] = imported()
+    control_count: int = imported()
 
     y: float = shared_memory()
     hold_handle: HoldHandle = shared_memory()
+    hold_owner_ref: EntityRef[Note] = shared_memory()
+    head_ref: EntityRef[Note] = shared_memory()
 
     pos: LanePosition = imported()
-    target_time: float = entity_data()
-    window: JudgmentWindow = entity_data()
-    bucket: Bucket = entity_data()
-    body_sprite: Sprite = entity_data()
-    arrow_sprite: Sprite = entity_data()
-    head_sprite: Sprite = entity_data()
-    connector_sprite: Sprite = entity_data()
-    particle: Particle = entity_data()
-    hold_particle: Particle = entity_data()
+    kind: int = entity_data()
     start_time: float = entity_data()
     target_scaled_time: float = entity_data()
     next_note_ref: EntityRef[Note] = entity_data()
+    sim_parent_ref: EntityRef[Note] = entity_data()
+    effective_spawn_time: float = entity_data()
+    control_times: Array[float, CONTROL_POINT_COUNT] = entity_data()
+    control_scaled_times: Array[float, CONTROL_POINT_COUNT] = entity_data()
 
-    started: bool = entity_memory()
-    needs_init: bool = entity_memory()
+    flags: int = entity_memory()
+    drawn: DrawCount = entity_memory()
+    drawn_connector: DrawCount = entity_memory()
 
     judgment: Judgment = imported()
     accuracy: StandardImport.ACCURACY
@@ -100,16 +107,11 @@ class Note(WatchArchetype):
             self.prev.direction = self.lane - self.prev.lane
 
         self.pos @= lane_to_pos(self.lane)
-        self.target_time = beat_to_time(self.beat)
-        self.window @= note_window(self.variant)
-        self.bucket @= note_bucket(self.variant)
-        self.body_sprite @= note_body_sprite(self.variant, self.direction)
-        self.arrow_sprite @= note_arrow_sprite(self.variant, self.direction)
-        self.head_sprite @= note_head_sprite(self.variant)
-        self.connector_sprite @= note_connector_sprite(self.variant)
-        self.particle @= note_particle(self.variant, self.direction)
-        self.hold_particle @= note_hold_particle(self.variant)
+        if self.target_time == 0:
+            self.target_time = beat_to_time(self.beat)
+        self.kind = note_kind_index(self.variant, self.direction)
 
+        self.preprocess_control_points()
         self.start_time, self.target_scaled_time = self.timescale_group.get_note_times(self.target_time)
 
         self.result.target_time = self.target_time
@@ -129,8 +131,66 @@ class Note(WatchArchetype):
         if self.has_prev and not (Options.boxy_sliders and self.variant == NoteVariant.HOLD_ANCHOR):
             self.prev_note_ref.get().next_note_ref @= self.ref()
 
+        self.preprocess_chain_head()
+        self.preprocess_spawn_time()
+
+    def preprocess_control_points(self):
+        # Control points come before this note, so they're converted first to keep timescale lookups in order.
+        if Options.boxy_sliders:
+            self.control_count = 0
+        for i in range(self.control_count):
+            if Options.mirror:
+                self.control_points[i].lane = -self.control_points[i].lane
+            self.control_times[i] = beat_to_time(self.control_points[i].beat)
+            _, scaled_time = self.timescale_group.get_note_times(self.control_times[i])
+            self.control_scaled_times[i] = scaled_time
+
+    def preprocess_chain_head(self):
+        # The chain head holds the hold particle and the ref of the note currently driving it.
+        self.head_ref @= self.ref()
+        if not self.has_prev:
+            self.hold_owner_ref @= self.ref()
+            return
+        ref = copy(self.prev_note_ref)
+        while ref.index > self.index and ref.get().has_prev:
+            ref @= ref.get().prev_note_ref
+        if ref.index < self.index:
+            self.head_ref @= ref.get().head_ref
+        else:
+            self.head_ref @= ref
+
+    def preprocess_spawn_time(self):
+        # A note spawns with its prev, so its connector is there from the start, and with its whole sim chain.
+        # Preprocessing runs in index order, so this note pulls from the notes before it and pushes its start
+        # time to any that depend on it. Notes after this one pull for themselves.
+        self.effective_spawn_time = self.start_time
+        if self.has_prev and self.prev_note_ref.index < self.index:
+            self.effective_spawn_time = min(self.effective_spawn_time, self.prev.start_time)
+        if self.has_sim:
+            self.sim_note.sim_parent_ref @= self.ref()
+            if self.sim_note_ref.index < self.index:
+                self.effective_spawn_time = min(self.effective_spawn_time, self.sim_note.effective_spawn_time)
+        if self.sim_parent_ref.index > 0:
+            self.effective_spawn_time = min(self.effective_spawn_time, self.sim_parent_ref.get().effective_spawn_time)
+        self.lower_sim_spawn_times(self.index)
+        if self.has_next and self.next_note_ref.index < self.index and self.start_time < self.next.effective_spawn_time:
+            self.next.effective_spawn_time = self.start_time
+            self.next.lower_sim_spawn_times(self.index)
+
+    def lower_sim_spawn_times(self, cursor: int):
+        # Sim notes form a chain, and preprocessed parts of it already share one spawn time,
+        # so each walk stops at the first note that is already early enough.
+        ref = copy(self.sim_note_ref)
+        while 0 < ref.index < cursor and ref.get().effective_spawn_time > self.effective_spawn_time:
+            ref.get().effective_spawn_time = self.effective_spawn_time
+            ref @= ref.get().sim_note_ref
+        ref @= self.sim_parent_ref
+        while ref.index > 0 and ref.get().effective_spawn_time > self.effective_spawn_time:
+            ref.get().effective_spawn_time = self.effective_spawn_time
+            ref @= ref.get().sim_parent_ref
+
     def spawn_time(self) -> float:
-        return min(self.start_time, self.prev_start_time, self.sim_start_time)
+        return self.effective_spawn_time
 
     def despawn_time(self) -> float:
         if is_replay():
@@ -138,40 +198,60 @@ class Note(WatchArchetype):
         else:
             return self.target_time
 
-    def initialize(self):
-        self.needs_init = True
-
     def update_sequential(self):
-        if self.needs_init:
-            self.hold_handle.destroy()
-        self.needs_init = False
         self.y = note_y(self.timescale_group.scaled_time, self.target_scaled_time)
-        if self.has_sim and time() < self.sim_note.spawn_time():
-            self.sim_note.y = note_y(self.sim_note.timescale_group.scaled_time, self.sim_note.target_scaled_time)
-        if self.has_prev and (time() >= self.prev.despawn_time()) and self.prev.judgment == Judgment.MISS:
-            if self.hold_handle == self.prev.hold_handle:
-                self.hold_handle.destroy()
-            self.prev.hold_handle.destroy()
-        if self.has_prev and self.prev.hold_handle != self.hold_handle and self.prev.hold_handle.is_active:
-            self.hold_handle.destroy()
-            self.hold_handle @= self.prev.hold_handle
-        if is_skip():
-            self.hold_handle.destroy()
-            if self.has_prev:
-                self.prev.hold_handle.destroy()
         self.update_particle()
+        self.update_visibility()
+        if Options.debug_counters:
+            # Level memory can't be written in update_parallel, so the last frame's draws are counted here.
+            debug_count(DebugCounter.NOTES)
+            debug_count(DebugCounter.DRAWS, self.drawn.sprites + self.drawn_connector.sprites)
+            debug_count(DebugCounter.CONNECTOR_SEGMENTS, self.drawn_connector.sprites)
+            debug_count(DebugCounter.TRANSFORMS, self.drawn.transforms + self.drawn_connector.transforms)
 
     def update_parallel(self):
+        self.draw()
+
+    def draw(self):
+        self.drawn = zeros(DrawCount)
+        self.drawn_connector = zeros(DrawCount)
         if Options.boxy_sliders and self.variant == NoteVariant.HOLD_ANCHOR:
             return
-        self.draw_body()
-        self.draw_connector()
-        self.draw_arrow()
-        self.draw_sim_line()
+        flags = self.flags
+        if has_flag(flags, NoteFlag.BODY_VISIBLE):
+            self.draw_body()
+            self.draw_arrow()
+        if has_flag(flags, NoteFlag.CONNECTOR_VISIBLE):
+            self.draw_connector()
+        if has_flag(flags, NoteFlag.SIM_LINE_VISIBLE):
+            self.draw_sim_line()
+
+    def update_visibility(self):
+        # A finished prev means the connector is drawn from the judge line, so it can't be culled by span.
+        self.flags = with_visibility(
+            self.flags,
+            body=y_on_stage(self.y),
+            connector=self.has_prev and (time() >= self.prev.despawn_time() or self.connector_on_stage()),
+            sim_line=Options.sim_lines_enabled and self.has_sim and span_on_stage(self.y, self.sim_y()),
+        )
+
+    def connector_on_stage(self) -> bool:
+        # The path bends through its control points, which can lie outside the span between the two notes.
+        low = min(self.y, self.prev.y)
+        high = max(self.y, self.prev.y)
+        for i in range(self.control_count):
+            y = self.control_y(i)
+            low = min(low, y)
+            high = max(high, y)
+        return span_on_stage(low, high)
+
+    def sim_y(self) -> float:
+        # A sim note with a higher index hasn't updated its y yet this frame, so it's computed here instead.
+        return note_y(self.sim_note.timescale_group.scaled_time, self.sim_note.target_scaled_time)
 
     def draw_body(self):
         if self.variant != NoteVariant.HOLD_ANCHOR:
-            draw_note_body(
+            self.drawn += draw_note_body(
                 sprite=self.body_sprite,
                 pos=self.pos,
                 y=self.y,
@@ -194,59 +274,95 @@ class Note(WatchArchetype):
             ref @= self.prev_note_ref
         prev = ref.get()
         if not prev_finished:
-            draw_note_connector(
-                sprite=self.connector_sprite,
-                pos=self.pos,
-                y=self.y,
-                prev_pos=prev.pos,
-                prev_y=prev.y,
-            )
+            self.draw_connector_path(prev.pos, prev.y, 0)
         elif time() < self.target_time:
             if prev.judgment == Judgment.MISS:
                 return
-            prev_target_time = prev.target_time
-            target_time = self.target_time
-            progress = max(0, unlerp(prev_target_time, target_time, time()))
-            prev_pos = lerp(prev.pos, self.pos, progress)
+            passed = self.passed_control_count()
+            prev_pos = self.hold_pos(prev, passed)
             if Options.boxy_sliders:
                 prev_pos @= self.pos
-            draw_note_connector(
-                sprite=self.connector_sprite,
-                pos=self.pos,
-                y=self.y,
-                prev_pos=prev_pos,
-                prev_y=0,
-            )
-            draw_note_head(
+            self.draw_connector_path(prev_pos, 0, passed)
+            self.drawn += draw_note_head(
                 sprite=self.head_sprite,
                 pos=prev_pos,
                 y=0,
             )
         elif self.variant != NoteVariant.HOLD_END and prev.judgment != Judgment.MISS:
-            draw_note_head(
+            self.drawn += draw_note_head(
                 sprite=self.head_sprite,
                 pos=self.pos,
                 y=0,
             )
 
+    def draw_connector_path(self, prev_pos: LanePosition, prev_y: float, first_control: int):
+        from_pos = copy(prev_pos)
+        from_y = prev_y
+        for i in range(first_control, self.control_count):
+            pos = self.control_pos(i)
+            y = self.control_y(i)
+            self.drawn_connector += draw_note_connector(
+                sprite=self.connector_sprite,
+                pos=pos,
+                y=y,
+                prev_pos=from_pos,
+                prev_y=from_y,
+            )
+            from_pos @= pos
+            from_y = y
+        self.drawn_connector += draw_note_connector(
+            sprite=self.connector_sprite,
+            pos=self.pos,
+            y=self.y,
+            prev_pos=from_pos,
+            prev_y=from_y,
+        )
+
+    def control_pos(self, i: int) -> LanePosition:
+        return lane_to_pos(self.control_points[i].lane)
+
+    def control_y(self, i: int) -> float:
+        return note_y(self.timescale_group.scaled_time, self.control_scaled_times[i])
+
+    def passed_control_count(self) -> int:
+        passed = 0
+        for i in range(self.control_count):
+            if time() >= self.control_times[i]:
+                passed += 1
+        return passed
+
+    def hold_pos(self, prev: Note, passed: int) -> LanePosition:
+        # The hold moves along the segment between the last control point it passed and the next one.
+        from_pos = copy(prev.pos)
+        from_time = prev.target_time
+        if passed > 0:
+            from_pos @= self.control_pos(passed - 1)
+            from_time = self.control_times[passed - 1]
+        to_pos = copy(self.pos)
+        to_time = self.target_time
+        if passed < self.control_count:
+            to_pos @= self.control_pos(passed)
+            to_time = self.control_times[passed]
+        return lerp(from_pos, to_pos, max(0, unlerp(from_time, to_time, time())))
+
     def draw_arrow(self):
         match self.variant:
             case NoteVariant.FLICK | NoteVariant.DIRECTIONAL_FLICK:
-                draw_note_arrow(
+                self.drawn += draw_note_arrow(
                     sprite=self.arrow_sprite,
                     direction=self.direction,
                     pos=self.pos,
                     y=self.y,
                 )
             case NoteVariant.SWING:
-                draw_swing_arrow(
+                self.drawn += draw_swing_arrow(
                     sprite=self.arrow_sprite,
                     direction=self.direction,
                     pos=self.pos,
                     y=self.y,
                 )
             case NoteVariant.HOLD_START | NoteVariant.HOLD_TICK if Options.boxy_sliders and self.direction != 0:
-                draw_swing_arrow(
+                self.drawn += draw_swing_arrow(
                     sprite=self.arrow_sprite,
                     direction=self.direction,
                     pos=self.pos,
@@ -261,7 +377,7 @@ class Note(WatchArchetype):
         sim = self.sim_note
         if time() >= sim.despawn_time():
             return
-        draw_note_sim_line(
+        self.drawn += draw_note_sim_line(
             pos=self.pos,
             y=self.y,
             sim_pos=sim.pos,
@@ -271,59 +387,43 @@ class Note(WatchArchetype):
     def update_particle(self):
         if Options.boxy_sliders and self.variant == NoteVariant.HOLD_ANCHOR:
             return
-        if not self.has_prev:
+        self.advance_hold_owner()
+        if not self.has_prev or self.head.hold_owner_ref.index != self.index:
             return
-        prev_finished = True
-        ref = copy(self.prev_note_ref)
-        for _ in range(20):
-            # Handle a tick finishing before previous anchors by looking further back.
-            prev_finished = prev_finished and time() >= ref.get().despawn_time()
-            if not prev_finished:
-                break
-            if not ref.get().has_prev:
-                break
-            ref @= ref.get().prev_note_ref
-        if prev_finished:
-            ref @= self.prev_note_ref
-        prev = ref.get()
-        if not prev_finished:
-            if self.hold_handle != prev.hold_handle:
-                self.hold_handle.destroy()
-                self.hold_handle @= prev.hold_handle
+        # Ownership only moves past despawned notes, so the owner's prev has always despawned.
+        prev = self.prev
+        if prev.judgment == Judgment.MISS:
+            self.head.hold_handle.destroy()
         elif time() < self.target_time:
-            if prev.judgment == Judgment.MISS:
-                self.hold_handle.destroy()
-            else:
-                prev_target_time = prev.target_time
-                target_time = self.target_time
-                progress = max(0, unlerp(prev_target_time, target_time, time()))
-                prev_pos = lerp(prev.pos, self.pos, progress)
-                if Options.boxy_sliders:
-                    prev_pos @= self.pos
-                self.hold_handle.update(
-                    particle=self.hold_particle,
-                    pos=prev_pos,
-                )
-        elif self.variant != NoteVariant.HOLD_END and prev.judgment != Judgment.MISS:
-            self.hold_handle.update(
+            prev_pos = self.hold_pos(prev, self.passed_control_count())
+            if Options.boxy_sliders:
+                prev_pos @= self.pos
+            self.head.hold_handle.update(
+                particle=self.hold_particle,
+                pos=prev_pos,
+            )
+        elif self.variant != NoteVariant.HOLD_END:
+            self.head.hold_handle.update(
                 particle=self.hold_particle,
                 pos=self.pos,
             )
-        else:
-            pass
+
+    def advance_hold_owner(self):
+        # Despawns are time based here, so ownership is advanced by whichever chain note runs first,
+        # and restarted from the head after a skip since time may have moved backwards.
+        if is_skip():
+            self.head.hold_handle.destroy()
+            self.head.hold_owner_ref @= self.head_ref
+        ref = copy(self.head.hold_owner_ref)
+        if ref.index == 0 or time() < ref.get().despawn_time():
+            return
+        while ref.index > 0 and time() >= ref.get().despawn_time():
+            ref @= ref.get().next_note_ref
+        self.head.hold_owner_ref @= ref
 
     def terminate(self):
         if not self.has_next:
-            self.hold_handle.handle.destroy()
-            if self.has_prev:
-                ref = copy(self.prev_note_ref)
-                while True:
-                    ref.get().hold_handle.handle.destroy()
-                    if not ref.get().has_prev:
-                        break
-                    ref @= ref.get().prev_note_ref
-        elif self.next.hold_handle != self.hold_handle:
-            self.hold_handle.handle.destroy()
+            self.head.hold_handle.handle.destroy()
         if (not is_replay() or self.judgment != Judgment.MISS) and self.variant != NoteVariant.HOLD_ANCHOR:
             play_watch_hit_effects(
                 note_particle=self.particle,
@@ -334,6 +434,42 @@ class Note(WatchArchetype):
     def timescale_group(self) -> TimescaleGroup:
         return self.timescale_group_ref.get()
 
+    @property
+    def note_kind(self) -> NoteKind:
+        return note_kinds[self.kind]
+
+    @property
+    def window(self) -> JudgmentWindow:
+        return self.note_kind.window
+
+    @property
+    def bucket(self) -> Bucket:
+        return self.note_kind.bucket
+
+    @property
+    def body_sprite(self) -> Sprite:
+        return self.note_kind.body_sprite
+
+    @property
+    def arrow_sprite(self) -> Sprite:
+        return self.note_kind.arrow_sprite
+
+    @property
+    def head_sprite(self) -> Sprite:
+        return self.note_kind.head_sprite
+
+    @property
+    def connector_sprite(self) -> Sprite:
+        return self.note_kind.connector_sprite
+
+    @property
+    def particle(self) -> Particle:
+        return self.note_kind.particle
+
+    @property
+    def hold_particle(self) -> Particle:
+        return self.note_kind.hold_particle
+
     @property
     def prev(self) -> Note:
         return self.prev_note_ref.get()
@@ -342,12 +478,6 @@ class Note(WatchArchetype):
     def has_prev(self) -> bool:
         return self.prev_note_ref.index > 0
 
-    @property
-    def prev_start_time(self) -> float:
-        if not self.has_prev:
-            return 1e8
-        return self.prev_note_ref.get().start_time
-
     @property
     def sim_note(self) -> Note:
         return self.sim_note_ref.get()
@@ -357,10 +487,8 @@ class Note(WatchArchetype):
         return self.sim_note_ref.index > 0
 
     @property
-    def sim_start_time(self) -> float:
-        if not self.has_sim:
-            return 1e8
-        return self.sim_note.start_time
+    def head(self) -> Note:
+        return self.head_ref.get()
 
     @property
     def has_next(self) -> bool:
@@ -2,6 +2,8 @@ import multiprocessing as mp
 from collections.abc import Callable
 from pathlib import Path
 
+from convexity.convert.budget import BudgetExceededError
+from convexity.convert.compact import compact_export_dir
 from convexity.convert.sonolus_bandori import convert_sonolus_bandori_level_data
 from convexity.convert.sonolus_llsif import convert_sonolus_llsif_level_data
 from convexity.convert.sonolus_nanaon import convert_sonolus_nanaon_level_data
@@ -25,8 +27,12 @@ def convert_level(item: dict, base_url: str, tag: str, converter: Callable, proc
         print(f"[Process {process_num}] Skipped: {name}")
         return
 
+    try:
+        converted = convert_sonolus_level_item(item, base_url, tag, converter)
+    except BudgetExceededError as e:
+        print(f"[Process {process_num}] Rejected: {name}\n{e}")
+        return
     level_dir.mkdir(parents=True, exist_ok=True)
-    converted = convert_sonolus_level_item(item, base_url, tag, converter)
     converted.export("convexity").write_to_dir(level_dir)
     print(f"[Process {process_num}] Downloaded: {name}")
 
@@ -54,6 +60,12 @@ def download_playlists(base_url: str, tag: str):
     print("Done!")
 
 
+def compact_levels():
+    print("Compacting level data...")
+    compact_export_dir(BASE_DIR / "levels")
+    print("Done!")
+
+
 def export_engine():
     engine.export().write_to_dir(BASE_DIR / "engines" / "convexity")
 
@@ -71,6 +83,7 @@ def main():
     download_levels(
         base_url="https://sonolus.milkbun.org/nanaon/", converter=convert_sonolus_nanaon_level_data, tag="Nanaon"
     )
+    compact_levels()
     export_engine()
 
 
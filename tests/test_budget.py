@@ -0,0 +1,53 @@
+from convexity.common.note import NoteVariant
+from convexity.convert.analysis import Chart, ChartNote
+from convexity.convert.budget import Budget, check_budget, connector_segments, spawn_times
+
+
+def chart(*notes: ChartNote) -> Chart:
+    return Chart(
+        archetype_counts={"Note": len(notes)},
+        bpm_changes=[(0, 60)],
+        timescale_changes=[],
+        notes=list(notes),
+    )
+
+
+def test_connector_segments_grow_with_lane_and_time():
+    assert connector_segments(0, 0, 0, 0.5) == 1
+    assert connector_segments(2, 0, 0.25, 0.5) == 10 + 25 + 1
+    assert connector_segments(2, 0, 4, 0.5) == 10 + 50 + 1
+
+
+def test_spawn_times_follow_prev_and_sim_notes():
+    # The tail spawns with its head, and the note sim to the tail spawns with both.
+    c = chart(
+        ChartNote(beat=0, lane=0, variant=NoteVariant.HOLD_START, prev=-1, sim=-1),
+        ChartNote(beat=4, lane=2, variant=NoteVariant.HOLD_END, prev=0, sim=2),
+        ChartNote(beat=4, lane=-2, variant=NoteVariant.SINGLE, prev=-1, sim=-1),
+        ChartNote(beat=8, lane=0, variant=NoteVariant.SINGLE, prev=-1, sim=-1),
+    )
+    spawns = spawn_times(c, c.timeline, [0, 4, 4, 8], 0.5)
+    assert spawns == [-0.5, -0.5, -0.5, 7.5]
+
+
+def test_check_budget_counts_connectors_through_control_points():
+    head = ChartNote(beat=0, lane=0, variant=NoteVariant.HOLD_START, prev=-1, sim=-1)
+    straight = check_budget(chart(head, ChartNote(beat=4, lane=2, variant=NoteVariant.HOLD_END, prev=0, sim=-1)))
+    bent = check_budget(
+        chart(head, ChartNote(beat=4, lane=2, variant=NoteVariant.HOLD_END, prev=0, sim=-1, controls=((2, 4),)))
+    )
+    assert straight.peak_connector_segments == 61
+    assert bent.peak_connector_segments == 71 + 61
+    assert straight.peak_spawned_notes == 2
+    assert straight.entity_count == 2
+    assert not straight.over_budget
+
+
+def test_check_budget_reports_hot_spots():
+    notes = [ChartNote(beat=beat, lane=0, variant=NoteVariant.SINGLE, prev=-1, sim=-1) for beat in (4, 4.1, 4.2, 8)]
+    report = check_budget(chart(*notes), Budget(max_spawned_notes=2))
+    assert report.over_budget
+    assert report.peak_spawned_notes == 3
+    assert len(report.hot_spots) == 1
+    assert report.hot_spots[0].spawned_notes == 3
+    assert 3.5 <= report.hot_spots[0].start_beat <= report.hot_spots[0].end_beat <= 4.2
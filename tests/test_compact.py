@@ -0,0 +1,70 @@
+import math
+
+import pytest
+
+from convexity.convert.compact import compact_level_data, compact_value, verify_compact
+from convexity.convert.utils import parse_entities
+
+
+def bpm_change(beat: float, bpm: float) -> dict:
+    return {"archetype": "#BPM_CHANGE", "data": [{"name": "#BEAT", "value": beat}, {"name": "#BPM", "value": bpm}]}
+
+
+def note(beat: float, lane: float = 0, **fields) -> dict:
+    data = [{"name": "beat", "value": beat}, {"name": "lane", "value": lane}]
+    data.extend(
+        {"name": name, "ref": value} if isinstance(value, str) else {"name": name, "value": value}
+        for name, value in fields.items()
+    )
+    return {"archetype": "Note", "data": data}
+
+
+def nonzero_entities(entities: list[dict]) -> list[tuple[str, dict[str, float]]]:
+    # Imported fields that are missing read as zero.
+    return [(e.archetype, {k: v for k, v in e.data.items() if v != 0}) for e in parse_entities(entities)]
+
+
+def test_compact_round_trip_keeps_entities():
+    head = {**note(1, 2.0), "name": "head"}
+    unreferenced = {**note(2, -1.0), "name": "unreferenced"}
+    entities = [bpm_change(0, 120), head, unreferenced, note(3, 0.5, prev_note_ref="head")]
+    compacted = compact_level_data({"bgmOffset": 0, "entities": entities})
+    assert nonzero_entities(compacted["entities"]) == nonzero_entities(entities)
+    assert "name" not in compacted["entities"][2]
+    assert compacted["entities"][1]["name"] != "head"
+    assert compacted["entities"][0]["data"] == [{"name": "#BPM", "value": 120}]
+
+
+def test_compact_quantizes_beats_and_their_target_times():
+    entities = [bpm_change(0, 120), note(1.0004, target_time=0.5002), note(2 + 1 / 3, control_count=0)]
+    compacted = parse_entities(compact_level_data({"entities": entities})["entities"])
+    assert compacted[1].data == {"beat": 1, "target_time": 0.5}
+    assert compacted[2].data["beat"] == round((2 + 1 / 3) * 480) / 480
+
+
+def test_compact_refuses_to_quantize_when_times_would_move():
+    # At 10 BPM a tick is 12.5 ms, so rounding to it moves the note by more than the allowed 1 ms.
+    entities = [bpm_change(0, 10), note(1.0007)]
+    with pytest.raises(ValueError, match="moved"):
+        compact_level_data({"entities": entities})
+    compacted = parse_entities(compact_level_data({"entities": entities}, None)["entities"])
+    assert compacted[1].data["beat"] == pytest.approx(1.0007)
+
+
+def test_verify_compact_rejects_stale_target_times():
+    # The beat moves by 0.9 ms, which is allowed, but the target time left behind is now 1.8 ms off.
+    original = [bpm_change(0, 120), note(2.0018, target_time=1.0018)]
+    with pytest.raises(ValueError, match="no longer matches"):
+        verify_compact(original, [bpm_change(0, 120), note(2, target_time=1.0018)])
+
+
+def test_verify_compact_rejects_swapped_beats():
+    original = [bpm_change(0, 120), note(1), note(1.0001)]
+    with pytest.raises(ValueError, match="swapped"):
+        verify_compact(original, [bpm_change(0, 120), note(1.0001), note(1)])
+
+
+def test_compact_value_passes_non_finite_values():
+    assert compact_value("beat", math.inf, 480) == math.inf
+    assert compact_value("lane", 3.0, 480) == 3
+    assert isinstance(compact_value("lane", 3.0, 480), int)
@@ -0,0 +1,18 @@
+from convexity.convert.controls import fold_anchor_runs
+
+
+def test_fold_anchor_runs_attaches_anchors_to_the_next_note():
+    assert fold_anchor_runs([False, True, True, False]) == {3: [1, 2]}
+    assert fold_anchor_runs([False, True, False, True, False]) == {2: [1], 4: [3]}
+
+
+def test_fold_anchor_runs_keeps_anchors_past_the_limit():
+    # The third anchor stays an entity and carries the two before it, the fourth is carried by the end.
+    assert fold_anchor_runs([False, True, True, True, True, False]) == {3: [1, 2], 5: [4]}
+    assert fold_anchor_runs([False, True, True, True, False], max_controls=1) == {2: [1], 4: [3]}
+
+
+def test_fold_anchor_runs_keeps_the_chain_ends():
+    assert fold_anchor_runs([True, True]) == {}
+    assert fold_anchor_runs([True, True, True]) == {2: [1]}
+    assert fold_anchor_runs([]) == {}
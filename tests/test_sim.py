@@ -0,0 +1,44 @@
+import pytest
+
+from convexity.common.note import NoteVariant
+from convexity.convert.sim import link_sim_notes, sim_pairs, snap_beats
+from convexity.play.note import Note
+
+
+def test_snap_beats_merges_float_noise():
+    beats = [1.0, 1.001, 2.0]
+    assert snap_beats(beats, [0, 1, 2]) == [1.0, 1.0, 2.0]
+
+
+def test_sim_pairs_links_left_to_right():
+    beats, pairs = sim_pairs([1, 1, 2, 1], [3, -1, 0, 1])
+    assert beats == [1, 1, 2, 1]
+    assert pairs == [(1, 3), (3, 0)]
+
+
+def test_sim_pairs_skips_unlinkable_notes():
+    _, pairs = sim_pairs([1, 1, 1], [0, 1, 2], [True, False, True])
+    assert pairs == [(0, 2)]
+
+
+def test_link_sim_notes_sets_refs_and_snaps_beats():
+    notes = [
+        Note(variant=NoteVariant.SINGLE, beat=1, lane=2),
+        Note(variant=NoteVariant.SINGLE, beat=1.001, lane=-2),
+        Note(variant=NoteVariant.HOLD_ANCHOR, beat=1, lane=0),
+    ]
+    link_sim_notes(notes)
+    assert notes[1].beat == 1
+    assert getattr(notes[1].sim_note_ref, "_ref_", None) is notes[0]
+    assert getattr(notes[0].sim_note_ref, "_ref_", None) is None
+    assert getattr(notes[2].sim_note_ref, "_ref_", None) is None
+
+
+def test_link_sim_notes_clears_times_of_snapped_notes():
+    notes = [
+        Note(variant=NoteVariant.SINGLE, beat=1, lane=2, target_time=0.5),
+        Note(variant=NoteVariant.SINGLE, beat=1.001, lane=-2, target_time=0.5005),
+    ]
+    link_sim_notes(notes)
+    assert notes[0].target_time == pytest.approx(0.5)
+    assert notes[1].target_time == 0
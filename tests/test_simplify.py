@@ -0,0 +1,24 @@
+from convexity.convert.simplify import lane_error, simplify_chain
+
+
+def test_lane_error_measures_at_the_points_beat():
+    assert lane_error((0, 0), (4, 4), (1, 3)) == 2
+    assert lane_error((2, 0), (2, 3), (2, 1)) == 2
+
+
+def test_simplify_chain_keeps_endpoints():
+    points = [(0, 0), (1, 1), (2, 2)]
+    assert simplify_chain(points, [True, True, True], 0) == [0, 2]
+    assert simplify_chain([(0, 0)], [True], 0) == [0]
+    assert simplify_chain([], [], 0) == []
+
+
+def test_simplify_chain_keeps_points_off_the_line():
+    points = [(0, 0), (1, 1.5), (2, 3), (3, 3), (4, 3)]
+    assert simplify_chain(points, [False, True, True, True, False], 0.1) == [0, 2, 4]
+    assert simplify_chain(points, [False, True, True, True, False], 2) == [0, 4]
+
+
+def test_simplify_chain_keeps_points_that_are_not_removable():
+    points = [(0, 0), (1, 0), (2, 0), (3, 0)]
+    assert simplify_chain(points, [False, True, False, True], 1) == [0, 2, 3]
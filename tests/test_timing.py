@@ -0,0 +1,65 @@
+import pytest
+
+from convexity.common.note import NoteVariant
+from convexity.convert.timing import Timeline, fill_note_times, spawn_sorted_entities
+from convexity.play.bpm import BpmChange
+from convexity.play.init import Init
+from convexity.play.note import Note
+from convexity.play.timescale import TimescaleChange, TimescaleGroup
+
+
+def test_timeline_beat_to_time_follows_bpm_changes():
+    timeline = Timeline([(0, 120), (4, 60)], [])
+    assert timeline.beat_to_time(2) == 1
+    assert timeline.beat_to_time(4) == 2
+    assert timeline.beat_to_time(5) == 3
+    assert timeline.time_to_beat(3) == 5
+
+
+def test_fill_note_times_fills_missing_times():
+    notes = [Note(variant=NoteVariant.SINGLE, beat=2), Note(variant=NoteVariant.SINGLE, beat=6)]
+    fill_note_times(notes, [BpmChange(beat=0, bpm=120), BpmChange(beat=4, bpm=60)])
+    assert [note.target_time for note in notes] == [1, 4]
+
+
+def test_fill_note_times_keeps_matching_times():
+    notes = [Note(variant=NoteVariant.SINGLE, beat=2, target_time=1.0005)]
+    fill_note_times(notes, [BpmChange(beat=0, bpm=120)])
+    assert notes[0].target_time == pytest.approx(1.0005)
+
+
+def test_fill_note_times_rejects_mismatched_times():
+    notes = [Note(variant=NoteVariant.SINGLE, beat=2, target_time=1.5)]
+    with pytest.raises(AssertionError):
+        fill_note_times(notes, [BpmChange(beat=0, bpm=120)])
+
+
+def test_spawn_sorted_entities_emits_chains_in_spawn_order():
+    late_head = Note(variant=NoteVariant.HOLD_START, beat=8)
+    late_tail = Note(variant=NoteVariant.HOLD_END, beat=12, prev_note_ref=late_head.ref())
+    early = Note(variant=NoteVariant.SINGLE, beat=4)
+    init = Init()
+    bpm = BpmChange(beat=0, bpm=120)
+    entities = spawn_sorted_entities([init, late_head, late_tail, early, bpm])
+    assert entities == [init, bpm, early, late_head, late_tail]
+
+
+def test_spawn_sorted_entities_moves_sim_partner_chains_together():
+    first = Note(variant=NoteVariant.SINGLE, beat=4)
+    head = Note(variant=NoteVariant.HOLD_START, beat=8)
+    tail = Note(variant=NoteVariant.HOLD_END, beat=16, prev_note_ref=head.ref())
+    sim = Note(variant=NoteVariant.SINGLE, beat=16)
+    tail.sim_note_ref @= sim.ref()
+    between = Note(variant=NoteVariant.SINGLE, beat=12)
+    entities = spawn_sorted_entities([first, head, tail, sim, between])
+    assert entities == [first, head, tail, sim, between]
+
+
+def test_spawn_sorted_entities_uses_each_notes_timescale_group():
+    # A slow group spawns its notes earlier, so they come ahead of earlier notes in the default group.
+    group = TimescaleGroup()
+    changes = [TimescaleChange(beat=0, scale=1), TimescaleChange(beat=1, scale=0.1)]
+    slow = Note(variant=NoteVariant.SINGLE, beat=3, timescale_group_ref=group.ref())
+    fast = Note(variant=NoteVariant.SINGLE, beat=2)
+    entities = spawn_sorted_entities([group, *changes, fast, slow])
+    assert entities[-2:] == [slow, fast]